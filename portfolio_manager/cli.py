@@ -6,6 +6,7 @@ from time import sleep
 
 import click
 from data_sources.exchange_data.binance import (
+    build_panel,
     get_klines,
     load_symbols,
     fetch_exchange_data,
@@ -16,14 +17,22 @@ from utils.dynaconf_utils import settings
 from data_sources.social_media.reddit import get_popular_posts
 from data_sources.mine_factors import mine_factors_from_files
 from data_sources.fuse_data import create_latest_features
+from data_sources.sync_data import sync_data as run_sync_data
 from models.backtest import get_strategy_backtest_results
-from models.trading_strategy.inference import strategy_inference
+from models.parameter_sweep import get_strategy_sweep_results
+from models.trading_strategy.inference import score_latest_bars, strategy_inference
 
 
 @click.group()
-def cli():
+@click.option(
+    "--no-llm-cache",
+    is_flag=True,
+    help="Send every LLM request instead of reusing cached responses",
+)
+def cli(no_llm_cache):
     """Financial Portfolio Manager CLI"""
-    pass
+    if no_llm_cache:
+        settings.set("CHATGPT_CACHE_ENABLED", False)
 
 
 @cli.command()
@@ -53,5 +62,81 @@ def infer_strategy(start_dt, end_dt):
     click.echo("Trading strategy inference complete.")
 
 
+@cli.command()
+@click.option(
+    "--start-dt",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Start date",
+    required=True,
+)
+@click.option(
+    "--end-dt",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="End date",
+    required=True,
+)
+@click.option(
+    "--sweep-config",
+    default="dummy_sweep",
+    help="Name of the sweep configuration in the strategy configs directory",
+)
+@click.option(
+    "--max-workers",
+    type=int,
+    default=None,
+    help="Number of worker processes (default: number of CPUs)",
+)
+def sweep_strategy(start_dt, end_dt, sweep_config, max_workers):
+    """Backtest a grid of strategy parameters and factor weights"""
+    click.echo("Starting strategy parameter sweep...")
+    config_loader = ConfigLoader()
+    config_loader.load_configs()
+    market_data_df = build_panel(fetch_exchange_data(start_dt, end_dt))
+    results = get_strategy_sweep_results(
+        market_data_df, sweep_config, config_loader, max_workers=max_workers
+    )
+    click.echo(results.to_string())
+    click.echo("Strategy parameter sweep complete.")
+
+
+@cli.command()
+@click.option(
+    "--start-dt",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    help="Start date of the warm-up history",
+    required=True,
+)
+@click.option(
+    "--strategy-config",
+    default="dummy_strategy",
+    help="Name of the strategy configuration in the strategy configs directory",
+)
+def score_latest(start_dt, strategy_config):
+    """Score symbols on the latest closed bars with streaming factor updates"""
+    config_loader = ConfigLoader()
+    config_loader.load_configs()
+    strategy_conf = config_loader.get_config(strategy_config)
+    if not strategy_conf:
+        raise click.BadParameter(
+            f"Specified strategy configuration {strategy_config} not found."
+        )
+    factors = ["manual_factor_0", "manual_factor_1", "manual_factor_2"]
+    factor_weights = {factor_name: 1 / len(factors) for factor_name in factors}
+    scores = score_latest_bars(start_dt, factor_weights, strategy_conf["window"])
+    click.echo(scores.head(strategy_conf["coin_num"]).to_string())
+
+
+@cli.command()
+@click.option(
+    "--source",
+    "sources",
+    multiple=True,
+    help="Source to synchronize, may be repeated (default: all scheduled sources)",
+)
+def sync_data(sources):
+    """Keep the market data, news and social media tables up to date"""
+    asyncio.run(run_sync_data(list(sources) or None))
+
+
 if __name__ == "__main__":
     cli()
@@ -1,37 +1,151 @@
+import asyncio
 from datetime import datetime, timedelta
-from typing import List
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import ccxt
+import ccxt.async_support as ccxt_async
 import pandas as pd
+from data_sources.exchange_data.kline_store import (
+    get_stored_range,
+    read_klines,
+    write_klines,
+)
+from utils.async_utils import TokenBucket, retry_async
+from utils.cache_utils import get_cached_json
+from utils.db import copy_upsert, pooled_connection
 from utils.dynaconf_utils import settings
-from utils.dt_utils import datetime_range
+from utils.dt_utils import datetime_range, to_milliseconds
 
 binance = ccxt.binance()
 remove_list = set(settings.BINANCE_UNWANTED_SYMBOLS)
 
+KLINE_COLUMNS = [
+    "MTS",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "closeMTS",
+    "quote_volume",
+    "trade_num",
+    "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume",
+    "ignore",
+]
+KLINE_NUMERIC_COLUMNS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "quote_volume",
+    "trade_num",
+    "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume",
+]
+# Types of the formatted Klines columns. Timestamps stay datetime64[ns], which is stored as
+# int64 nanoseconds, rather than int64 epochs, as the store, the database and the backtests
+# compare and resample them as datetimes.
+KLINE_DTYPES = {
+    "Timestamp": "datetime64[ns]",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "volume": "float64",
+    "quote_volume": "float64",
+    "trade_num": "int64",
+    "taker_buy_base_asset_volume": "float64",
+    "taker_buy_quote_asset_volume": "float64",
+}
+KLINE_LIMIT = 1500
+# Columns of the `processed_market_data` table per Klines column.
+PROCESSED_MARKET_DATA_COLUMNS = {
+    "Timestamp": "timestamp",
+    "open": "open_price",
+    "high": "high_price",
+    "low": "low_price",
+    "close": "close_price",
+    "volume": "volume",
+    "quote_volume": "quote_volume",
+    "trade_num": "trade_num",
+    "taker_buy_base_asset_volume": "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume": "taker_buy_quote_asset_volume",
+    "symbol": "symbol",
+}
+
+
+def get_exchange_info(force_refresh: bool = False) -> dict:
+    """
+    Get the exchange information of Binance USD-M futures, cached for
+    `settings.METADATA_CACHE_TTL` seconds.
+
+    Args:
+        force_refresh (bool, optional): Whether to bypass the cache. Defaults to False.
+
+    Returns:
+        dict: The exchange information.
+    """
+    return get_cached_json(
+        Path(settings.ROOT_PATH_FOR_DYNACONF)
+        / settings.METADATA_CACHE_DIR
+        / "binance_exchange_info.json",
+        settings.METADATA_CACHE_TTL,
+        binance.fapiPublicGetExchangeInfo,
+        force_refresh=force_refresh,
+    )
 
-def load_symbols() -> List[str]:
+
+def get_symbol_metadata(force_refresh: bool = False) -> Dict[str, dict]:
     """
-    Load symbols from the binance.
+    Get the metadata of every symbol from the cached exchange information.
+
+    Args:
+        force_refresh (bool, optional): Whether to bypass the cache. Defaults to False.
+
+    Returns:
+        Dict[str, dict]: The status, contract type, quote asset, onboard date, tick size and
+            step size per symbol.
+    """
+    metadata = {}
+    for symbol in get_exchange_info(force_refresh=force_refresh)["symbols"]:
+        filters = {f["filterType"]: f for f in symbol.get("filters", [])}
+        metadata[symbol["symbol"]] = {
+            "status": symbol.get("status"),
+            "contract_type": symbol.get("contractType"),
+            "quote_asset": symbol.get("quoteAsset"),
+            "onboard_date": pd.to_datetime(int(symbol["onboardDate"]), unit="ms")
+            if symbol.get("onboardDate")
+            else None,
+            "tick_size": float(filters["PRICE_FILTER"]["tickSize"])
+            if "PRICE_FILTER" in filters
+            else None,
+            "step_size": float(filters["LOT_SIZE"]["stepSize"])
+            if "LOT_SIZE" in filters
+            else None,
+        }
+    return metadata
+
+
+def load_symbols(force_refresh: bool = False) -> List[str]:
+    """
+    Load the USDT perpetual symbols from the cached exchange information.
+
+    Args:
+        force_refresh (bool, optional): Whether to bypass the cache. Defaults to False.
 
     Returns:
         List[str]: A list of symbols.
     """
-    binance_info = binance.fapiPublicGetbinanceInfo()
-    symbol_list = list(
-        filter(
-            lambda x: bool(x),
-            [
-                symbol["symbol"]
-                if symbol["contractType"] == "PERPETUAL"
-                and symbol["symbol"] not in remove_list
-                and symbol["symbol"].endswith("USDT")
-                else None
-                for symbol in binance_info["symbols"]
-            ],
-        )
-    )
-    return symbol_list
+    return [
+        symbol
+        for symbol, metadata in get_symbol_metadata(force_refresh).items()
+        if metadata["contract_type"] == "PERPETUAL"
+        and symbol not in remove_list
+        and symbol.endswith("USDT")
+    ]
 
 
 def extract_columns(data: List[dict], column_names: List[str]) -> List[dict]:
@@ -51,8 +165,9 @@ def extract_columns(data: List[dict], column_names: List[str]) -> List[dict]:
 def get_klines(
     symbol: str,
     start_time: datetime,
+    end_time: Optional[datetime] = None,
     interval: str = "1h",
-    limit: int = 500,
+    limit: int = KLINE_LIMIT,
 ) -> List[dict]:
     """
     Get Klines (candlestick) data for a specific symbol.
@@ -60,34 +175,171 @@ def get_klines(
     Args:
         symbol (str): The symbol to retrieve the data for.
         start_time (datetime): The start time of the data.
+        end_time (datetime, optional): The exclusive end time of the data (default: None).
         interval (str, optional): The interval of the data (default: "1h").
-        limit (int, optional): The number of data points to retrieve (default: 500).
+        limit (int, optional): The number of data points to retrieve (default: 1500).
 
     Returns:
         List[dict]: The Klines data for the specified symbol.
     """
+    params = get_klines_params(
+        symbol, to_milliseconds(start_time), end_time, interval, limit
+    )
+    data = binance.fapiPublicGetKlines(params=params)
+    return extract_columns(data, KLINE_COLUMNS)
+
+
+def get_klines_params(
+    symbol: str,
+    start_ms: int,
+    end_time: Optional[datetime],
+    interval: str,
+    limit: int,
+) -> dict:
+    """
+    Build the query parameters of a Klines request.
+
+    Args:
+        symbol (str): The symbol to retrieve the data for.
+        start_ms (int): The start time of the data in milliseconds.
+        end_time (datetime, optional): The exclusive end time of the data.
+        interval (str): The interval of the data.
+        limit (int): The number of data points to retrieve.
+
+    Returns:
+        dict: The query parameters.
+    """
     params = {
         "symbol": symbol,
         "interval": interval,
-        "startTime": str(binance.parse8601(start_time)),
+        "startTime": str(start_ms),
         "limit": limit,
     }
-    data = binance.fapiPublicGetKlines(params=params)
-    columns = [
-        "symbol",
-        "MTS",
-        "open",
-        "high",
-        "low",
-        "close",
-        "volume",
-        "closeMTS",
-        "quote_volume",
-        "trade_num",
-        "taker_buy_base_asset_volume",
-        "taker_buy_quote_asset_volume",
-    ]
-    return extract_columns(data, columns)
+    if end_time is not None:
+        # Binance treats endTime as inclusive on the open time.
+        params["endTime"] = str(to_milliseconds(end_time) - 1)
+    return params
+
+
+def next_klines_cursor(
+    klines: List[dict], end_time: datetime, limit: int
+) -> Optional[int]:
+    """
+    Get the start time of the next Klines page.
+
+    Args:
+        klines (List[dict]): The current page of Klines data.
+        end_time (datetime): The exclusive end time of the data.
+        limit (int): The number of data points requested per page.
+
+    Returns:
+        Optional[int]: The next start time in milliseconds, or None when the range is exhausted.
+    """
+    if len(klines) < limit:
+        return None
+    cursor = int(klines[-1]["closeMTS"]) + 1
+    if cursor >= to_milliseconds(end_time):
+        return None
+    return cursor
+
+
+def iter_klines(
+    symbol: str,
+    start_time: datetime,
+    end_time: datetime,
+    interval: str = "1h",
+    limit: int = KLINE_LIMIT,
+) -> Iterator[List[dict]]:
+    """
+    Iterate over the pages of Klines data between two points in time.
+
+    Every page starts right after the `closeMTS` of the previous one, so the pages are
+    gap-free and do not overlap regardless of the interval.
+
+    Args:
+        symbol (str): The symbol to retrieve the data for.
+        start_time (datetime): The start time of the data.
+        end_time (datetime): The exclusive end time of the data.
+        interval (str, optional): The interval of the data (default: "1h").
+        limit (int, optional): The number of data points to retrieve per page (default: 1500).
+
+    Yields:
+        List[dict]: A page of Klines data for the specified symbol.
+    """
+    cursor = to_milliseconds(start_time)
+    while cursor is not None:
+        params = get_klines_params(symbol, cursor, end_time, interval, limit)
+        klines = extract_columns(
+            binance.fapiPublicGetKlines(params=params), KLINE_COLUMNS
+        )
+        if klines:
+            yield klines
+        cursor = next_klines_cursor(klines, end_time, limit)
+
+
+def get_klines_weight(limit: int) -> int:
+    """
+    Get the Binance request weight of a Klines request.
+
+    Args:
+        limit (int): The number of data points requested.
+
+    Returns:
+        int: The request weight charged by Binance.
+    """
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+async def iter_klines_async(
+    exchange: ccxt_async.binance,
+    symbol: str,
+    start_time: datetime,
+    end_time: datetime,
+    bucket: TokenBucket,
+    interval: str = "1h",
+    limit: int = KLINE_LIMIT,
+) -> List[List[dict]]:
+    """
+    Get all pages of Klines data between two points in time asynchronously.
+
+    Args:
+        exchange (ccxt_async.binance): The asynchronous Binance client.
+        symbol (str): The symbol to retrieve the data for.
+        start_time (datetime): The start time of the data.
+        end_time (datetime): The exclusive end time of the data.
+        bucket (TokenBucket): The token bucket tracking the Binance request weight.
+        interval (str, optional): The interval of the data (default: "1h").
+        limit (int, optional): The number of data points to retrieve per page (default: 1500).
+
+    Returns:
+        List[List[dict]]: The pages of Klines data for the specified symbol.
+    """
+    pages = []
+    cursor = to_milliseconds(start_time)
+    while cursor is not None:
+        params = get_klines_params(symbol, cursor, end_time, interval, limit)
+
+        async def _request():
+            await bucket.acquire(get_klines_weight(limit))
+            return await exchange.fapiPublicGetKlines(params=params)
+
+        data = await retry_async(
+            _request,
+            retries=settings.BINANCE_MAX_RETRIES,
+            base_delay=settings.BINANCE_RETRY_BASE_DELAY,
+            exceptions=(ccxt.NetworkError,),
+        )
+        klines = extract_columns(data, KLINE_COLUMNS)
+        if klines:
+            pages.append(klines)
+        cursor = next_klines_cursor(klines, end_time, limit)
+    return pages
 
 
 def get_funding_rate(symbol: str, start_time: datetime, limit: int = 500) -> List[dict]:
@@ -219,21 +471,60 @@ def get_taker_long_short_ratio(
     return extract_columns(data, columns)
 
 
-def aggregate_data(symbol: str, date_list: List[datetime]) -> pd.DataFrame:
+def format_klines(klines: List[dict], symbol: str) -> pd.DataFrame:
+    """
+    Format raw Klines data into a pandas DataFrame.
+
+    Args:
+        klines (List[dict]): The Klines data as returned by `get_klines`.
+        symbol (str): The symbol of the Klines data.
+
+    Returns:
+        pd.DataFrame: The formatted Klines data.
+    """
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+
+    df["symbol"] = symbol
+    df["MTS"] = pd.to_numeric(df["MTS"])  # Cast "MTS" column to numeric type
+    df["Timestamp"] = pd.to_datetime(df["MTS"], unit="ms")
+    df[KLINE_NUMERIC_COLUMNS] = df[KLINE_NUMERIC_COLUMNS].apply(pd.to_numeric)
+    return df[["symbol", *KLINE_DTYPES]].astype(KLINE_DTYPES)
+
+
+def deduplicate_klines(data: pd.DataFrame) -> pd.DataFrame:
     """
-    Aggregate data for a symbol and a list of dates.
+    Drop overlapping Klines and sort them by time.
+
+    Args:
+        data (pd.DataFrame): The concatenated Klines data of a symbol.
+
+    Returns:
+        pd.DataFrame: The deduplicated and sorted Klines data.
+    """
+    data.drop_duplicates(subset=["Timestamp"], keep="last", inplace=True)
+    data.sort_values("Timestamp", inplace=True)
+    data.reset_index(drop=True, inplace=True)
+    return data
+
+
+def aggregate_data(
+    symbol: str, start_dt: datetime, end_dt: datetime, interval: str = "1h"
+) -> pd.DataFrame:
+    """
+    Aggregate data for a symbol between two points in time.
 
     Args:
         symbol (str): The symbol to retrieve the data for.
-        date_list (List[datetime]): A list of dates to aggregate data for.
+        start_dt (datetime): The start time of the data.
+        end_dt (datetime): The exclusive end time of the data.
+        interval (str, optional): The interval of the data (default: "1h").
 
     Returns:
         pd.DataFrame: The aggregated data as a pandas DataFrame.
     """
-    data = pd.DataFrame()
+    frames = []
 
-    for start_time in date_list:
-        klines = get_klines(symbol, start_time)
+    for klines in iter_klines(symbol, start_dt, end_dt, interval):
         # funding_rate = get_funding_rate(symbol, start_time)
         # top_long_short_account_ratio = get_top_long_short_account_ratio(
         #     symbol, start_time
@@ -246,25 +537,7 @@ def aggregate_data(symbol: str, date_list: List[datetime]) -> pd.DataFrame:
         # )
         # taker_long_short_ratio = get_taker_long_short_ratio(symbol, start_time)
 
-        df = pd.DataFrame(klines)
-
-        df["MTS"] = pd.to_numeric(df["MTS"])  # Cast "MTS" column to numeric type
-        df["Timestamp"] = pd.to_datetime(df["MTS"], unit="ms")
-        df = df[
-            [
-                "symbol",
-                "Timestamp",
-                "open",
-                "high",
-                "low",
-                "close",
-                "volume",
-                "quote_volume",
-                "trade_num",
-                "taker_buy_base_asset_volume",
-                "taker_buy_quote_asset_volume",
-            ]
-        ]
+        df = format_klines(klines, symbol)
 
         # df = pd.merge(df, pd.DataFrame(funding_rate), on="Timestamp", how="left")
         # df["fundingRate"] = df["fundingRate"].fillna(method="ffill")
@@ -290,30 +563,239 @@ def aggregate_data(symbol: str, date_list: List[datetime]) -> pd.DataFrame:
         # )
 
         # data = data.append(df, ignore_index=True)
-        data = pd.concat([data, df], ignore_index=True)
+        frames.append(df)
 
-    data.drop_duplicates(subset=["Timestamp"], keep="last", inplace=True)
-    data.sort_values("Timestamp", inplace=True)
-    data.reset_index(drop=True, inplace=True)
+    data = pd.concat(frames, ignore_index=True) if frames else format_klines([], symbol)
+    return deduplicate_klines(data)
 
-    return data
 
+def split_time_windows(
+    start_dt: datetime, end_dt: datetime, window: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Split a time range into consecutive windows.
+
+    Args:
+        start_dt (datetime): The start time of the range.
+        end_dt (datetime): The exclusive end time of the range.
+        window (timedelta): The length of each window.
+
+    Returns:
+        List[Tuple[datetime, datetime]]: The (start, exclusive end) pairs covering the range.
+    """
+    return [
+        (window_start, min(window_start + window, end_dt))
+        for window_start in datetime_range(start_dt, end_dt, window)
+        if window_start < end_dt
+    ]
+
+
+async def fetch_klines_async(
+    ranges: Dict[str, List[Tuple[datetime, datetime]]],
+    interval: str = "1h",
+    max_concurrency: int = None,
+    weight_limit: int = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch Klines data for symbols x time windows concurrently.
+
+    Every range is split into windows of `settings.BINANCE_FETCH_WINDOW_DAYS` days and every
+    (symbol, window) pair is a separate task paginating through its window. The number of
+    in-flight requests is bounded by `max_concurrency`, and a token bucket keeps the consumed
+    request weight under the Binance per-minute limit.
+
+    Args:
+        ranges (Dict[str, List[Tuple[datetime, datetime]]]): The (start, exclusive end) ranges
+            to retrieve per symbol.
+        interval (str, optional): The interval of the data (default: "1h").
+        max_concurrency (int, optional): The maximum number of concurrent requests.
+            Defaults to `settings.BINANCE_MAX_CONCURRENCY`.
+        weight_limit (int, optional): The request weight allowed per minute.
+            Defaults to `settings.BINANCE_WEIGHT_LIMIT_PER_MINUTE`.
+
+    Returns:
+        Dict[str, pd.DataFrame]: The aggregated data per symbol.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or settings.BINANCE_MAX_CONCURRENCY)
+    bucket = TokenBucket(weight_limit or settings.BINANCE_WEIGHT_LIMIT_PER_MINUTE)
+    exchange = ccxt_async.binance({"enableRateLimit": False})
+
+    async def _fetch(
+        symbol: str, window_start: datetime, window_end: datetime
+    ) -> List[List[dict]]:
+        async with semaphore:
+            return await iter_klines_async(
+                exchange, symbol, window_start, window_end, bucket, interval
+            )
+
+    try:
+        windows = [
+            (symbol, window_start, window_end)
+            for symbol, symbol_ranges in ranges.items()
+            for start_dt, end_dt in symbol_ranges
+            for window_start, window_end in split_time_windows(
+                start_dt, end_dt, timedelta(days=settings.BINANCE_FETCH_WINDOW_DAYS)
+            )
+        ]
+        results = await asyncio.gather(*(_fetch(*window) for window in windows))
+    finally:
+        await exchange.close()
+
+    klines_per_symbol = {symbol: [] for symbol in ranges}
+    for (symbol, _, _), pages in zip(windows, results):
+        klines_per_symbol[symbol].extend(
+            format_klines(klines, symbol) for klines in pages
+        )
 
-def fetch_exchange_data(start_dt: datetime, end_dt: datetime) -> dict:
-    symbols = None
-    if settings.BINANCE_SYMBOLS:
-        symbols = settings.BINANCE_SYMBOLS
-    else:
-        symbols = load_symbols()
     return {
-        symbol: aggregate_data(
-            symbol,
-            date_list=[
-                dt for dt in datetime_range(start_dt, end_dt, timedelta(days=1))
-            ],
+        symbol: deduplicate_klines(
+            pd.concat(dfs, ignore_index=True) if dfs else format_klines([], symbol)
         )
+        for symbol, dfs in klines_per_symbol.items()
+    }
+
+
+async def fetch_exchange_data_async(
+    symbols: List[str],
+    start_dt: datetime,
+    end_dt: datetime,
+    interval: str = "1h",
+    **kwargs,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch Klines data for symbols between two points in time concurrently.
+
+    Args:
+        symbols (List[str]): The symbols to retrieve the data for.
+        start_dt (datetime): The start time of the data.
+        end_dt (datetime): The exclusive end time of the data.
+        interval (str, optional): The interval of the data (default: "1h").
+        **kwargs: Keyword arguments passed to `fetch_klines_async`.
+
+    Returns:
+        Dict[str, pd.DataFrame]: The aggregated data per symbol.
+    """
+    return await fetch_klines_async(
+        {symbol: [(start_dt, end_dt)] for symbol in symbols}, interval, **kwargs
+    )
+
+
+def get_missing_ranges(
+    symbol: str, start_dt: datetime, end_dt: datetime, interval: str
+) -> List[Tuple[datetime, datetime]]:
+    """
+    Get the ranges of a symbol's Klines which are not in the local store yet.
+
+    The head before the earliest synced start and the tail from the last stored bar onwards
+    are missing. The last stored bar is fetched again unless it was written after its close
+    time, as it may have been incomplete.
+
+    Args:
+        symbol (str): The symbol of the Klines data.
+        start_dt (datetime): The start time of the data.
+        end_dt (datetime): The exclusive end time of the data.
+        interval (str): The interval of the data.
+
+    Returns:
+        List[Tuple[datetime, datetime]]: The (start, exclusive end) ranges to fetch.
+    """
+    stored_range = get_stored_range(symbol, interval)
+    if stored_range is None:
+        return [(start_dt, end_dt)]
+
+    synced_from, last_open, last_synced_at = stored_range
+    last_close = last_open + pd.Timedelta(interval).to_pytimedelta()
+    is_last_complete = last_synced_at is not None and last_synced_at >= last_close
+    ranges = []
+    if start_dt < synced_from:
+        ranges.append((start_dt, synced_from))
+    if end_dt > last_close or (end_dt > last_open and not is_last_complete):
+        ranges.append((last_open, end_dt))
+    return ranges
+
+
+def sync_exchange_data(
+    symbols: List[str], start_dt: datetime, end_dt: datetime, interval: str = "1h"
+) -> Dict[str, pd.DataFrame]:
+    """
+    Read Klines data from the local store, fetching only what is missing from Binance.
+
+    Args:
+        symbols (List[str]): The symbols to retrieve the data for.
+        start_dt (datetime): The start time of the data.
+        end_dt (datetime): The exclusive end time of the data.
+        interval (str, optional): The interval of the data (default: "1h").
+
+    Returns:
+        Dict[str, pd.DataFrame]: The aggregated data per symbol.
+    """
+    ranges = {
+        symbol: get_missing_ranges(symbol, start_dt, end_dt, interval)
         for symbol in symbols
     }
+    ranges = {
+        symbol: symbol_ranges
+        for symbol, symbol_ranges in ranges.items()
+        if symbol_ranges
+    }
+    if ranges:
+        print(f"Fetching missing klines for {len(ranges)} of {len(symbols)} symbols.")
+        fetched = asyncio.run(fetch_klines_async(ranges, interval))
+        for symbol, data in fetched.items():
+            write_klines(data, symbol, interval, synced_from=start_dt)
+
+    return {
+        symbol: read_klines(symbol, interval, start_dt, end_dt) for symbol in symbols
+    }
+
+
+def get_configured_symbols() -> List[str]:
+    """
+    Get the configured symbols, or all tradable symbols if none are configured.
+
+    Returns:
+        List[str]: A list of symbols.
+    """
+    if settings.BINANCE_SYMBOLS:
+        return settings.BINANCE_SYMBOLS
+    return load_symbols()
+
+
+def fetch_exchange_data_range(
+    symbols: List[str], start_dt: datetime, end_dt: datetime
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch hourly Klines data for symbols, from the local store if enabled.
+
+    Args:
+        symbols (List[str]): The symbols to retrieve the data for.
+        start_dt (datetime): The start time of the data.
+        end_dt (datetime): The exclusive end time of the data.
+
+    Returns:
+        Dict[str, pd.DataFrame]: The aggregated data per symbol.
+    """
+    if settings.KLINE_STORE_ENABLED:
+        return sync_exchange_data(symbols, start_dt, end_dt)
+    return asyncio.run(
+        fetch_exchange_data_async(symbols, start_dt=start_dt, end_dt=end_dt)
+    )
+
+
+def fetch_exchange_data(start_dt: datetime, end_dt: datetime) -> dict:
+    """
+    Fetch hourly Klines data for the configured symbols.
+
+    Args:
+        start_dt (datetime): The start date of the data.
+        end_dt (datetime): The end date of the data, included as a whole day.
+
+    Returns:
+        dict: The aggregated data per symbol.
+    """
+    return fetch_exchange_data_range(
+        get_configured_symbols(), start_dt, end_dt + timedelta(days=1)
+    )
 
 
 def fetch_latest_exchange_data() -> dict:
@@ -321,3 +803,57 @@ def fetch_latest_exchange_data() -> dict:
         start_dt=datetime.today().replace(hour=0, minute=0, second=0, microsecond=0),
         end_dt=datetime.today().replace(hour=0, minute=0, second=0, microsecond=0),
     )
+
+
+def build_panel(data_per_symbol: dict) -> pd.DataFrame:
+    """
+    Assemble the Klines data of all symbols into a long format panel with a single concat.
+
+    The panel has a categorical "symbol" column, a datetime64[ns] "Timestamp" column, float64
+    prices and volumes, and an int64 "trade_num" column, and can be passed to
+    `compute_factors` as is. The timestamps are not converted to int64 epochs: datetime64[ns]
+    has the same int64 layout, and the Parquet store, `processed_market_data` and the
+    backtests compare, filter and resample them as datetimes.
+
+    Args:
+        data_per_symbol (dict): The Klines data per symbol, as returned by `aggregate_data`.
+
+    Returns:
+        pd.DataFrame: The Klines data of all symbols.
+    """
+    frames = [df for df in data_per_symbol.values() if not df.empty]
+    panel = pd.concat(frames, ignore_index=True) if frames else format_klines([], "")
+    panel["symbol"] = pd.Categorical(panel["symbol"])
+    return panel.astype(KLINE_DTYPES)
+
+
+def store_exchange_data(data_per_symbol: dict, source: str = "binance") -> int:
+    """
+    Upsert Klines data into the `processed_market_data` table.
+
+    The Klines of all symbols are written in bulk with `COPY`, batched by
+    `settings.POSTGRES_COPY_BATCH_SIZE`, over a pooled connection.
+
+    Args:
+        data_per_symbol (dict): The Klines data per symbol, as returned by `aggregate_data`.
+        source (str, optional): The source of the data. Defaults to "binance".
+
+    Returns:
+        int: The number of rows upserted.
+    """
+    frames = [df for df in data_per_symbol.values() if not df.empty]
+    if not frames:
+        return 0
+    data = pd.concat(frames, ignore_index=True)[
+        list(PROCESSED_MARKET_DATA_COLUMNS)
+    ].rename(columns=PROCESSED_MARKET_DATA_COLUMNS)
+    data["trade_num"] = data["trade_num"].astype("int64")
+    data["source"] = source
+    data["insert_dt"] = datetime.utcnow()
+    with pooled_connection() as connection:
+        return copy_upsert(
+            connection,
+            "processed_market_data",
+            data,
+            conflict_columns=["source", "symbol", "timestamp"],
+        )
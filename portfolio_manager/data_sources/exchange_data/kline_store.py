@@ -0,0 +1,163 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import orjson
+import pandas as pd
+from utils.dynaconf_utils import settings
+
+META_FILE = "_meta.json"
+
+
+def get_store_dir(symbol: str, interval: str) -> Path:
+    """
+    Get the directory holding the Klines partitions of a symbol and interval.
+
+    Args:
+        symbol (str): The symbol of the Klines data.
+        interval (str): The interval of the Klines data.
+
+    Returns:
+        Path: The directory of the partitions.
+    """
+    return (
+        Path(settings.ROOT_PATH_FOR_DYNACONF)
+        / settings.KLINE_STORE_DIR
+        / f"symbol={symbol}"
+        / f"interval={interval}"
+    )
+
+
+def get_partition_path(symbol: str, interval: str, month: pd.Period) -> Path:
+    """
+    Get the Parquet file of a monthly Klines partition.
+
+    Args:
+        symbol (str): The symbol of the Klines data.
+        interval (str): The interval of the Klines data.
+        month (pd.Period): The month of the partition.
+
+    Returns:
+        Path: The path of the partition file.
+    """
+    return get_store_dir(symbol, interval) / f"month={month.strftime('%Y-%m')}.parquet"
+
+
+def read_meta(symbol: str, interval: str) -> dict:
+    meta_path = get_store_dir(symbol, interval) / META_FILE
+    if not meta_path.exists():
+        return {}
+    return orjson.loads(meta_path.read_bytes())
+
+
+def write_meta(symbol: str, interval: str, meta: dict):
+    meta_path = get_store_dir(symbol, interval) / META_FILE
+    meta_path.parent.mkdir(parents=True, exist_ok=True)
+    meta_path.write_bytes(orjson.dumps(meta))
+
+
+def get_stored_range(
+    symbol: str, interval: str
+) -> Optional[Tuple[datetime, datetime, Optional[datetime]]]:
+    """
+    Get the time range covered by the stored Klines of a symbol.
+
+    The start of the range is the earliest start time ever synced, which may precede the
+    first stored bar when the symbol was listed later. The end of the range is the open time
+    of the last stored bar.
+
+    Args:
+        symbol (str): The symbol of the Klines data.
+        interval (str): The interval of the Klines data.
+
+    Returns:
+        Optional[Tuple[datetime, datetime, Optional[datetime]]]: The covered range and the
+            UTC time the last bar was written at, if known, or None if nothing is stored.
+    """
+    meta = read_meta(symbol, interval)
+    partitions = sorted(get_store_dir(symbol, interval).glob("month=*.parquet"))
+    if not meta or not partitions:
+        return None
+    last_partition = pd.read_parquet(partitions[-1], columns=["Timestamp"])
+    if last_partition.empty:
+        return None
+    last_open = last_partition["Timestamp"].max()
+    last_synced_at = None
+    if meta.get("last_open") and pd.Timestamp(meta["last_open"]) == last_open:
+        last_synced_at = pd.Timestamp(meta["last_synced_at"]).to_pydatetime()
+    return (
+        pd.Timestamp(meta["synced_from"]).to_pydatetime(),
+        last_open.to_pydatetime(),
+        last_synced_at,
+    )
+
+
+def read_klines(
+    symbol: str, interval: str, start_dt: datetime, end_dt: datetime
+) -> pd.DataFrame:
+    """
+    Read the stored Klines of a symbol between two points in time.
+
+    Only the monthly partitions overlapping the range are read.
+
+    Args:
+        symbol (str): The symbol of the Klines data.
+        interval (str): The interval of the Klines data.
+        start_dt (datetime): The start time of the data.
+        end_dt (datetime): The exclusive end time of the data.
+
+    Returns:
+        pd.DataFrame: The stored Klines data, sorted by time.
+    """
+    dfs = [
+        pd.read_parquet(path)
+        for path in (
+            get_partition_path(symbol, interval, month)
+            for month in pd.period_range(start_dt, end_dt, freq="M")
+        )
+        if path.exists()
+    ]
+    if not dfs:
+        return pd.DataFrame()
+    data = pd.concat(dfs, ignore_index=True)
+    data = data[(data["Timestamp"] >= start_dt) & (data["Timestamp"] < end_dt)]
+    return data.sort_values("Timestamp").reset_index(drop=True)
+
+
+def write_klines(data: pd.DataFrame, symbol: str, interval: str, synced_from: datetime):
+    """
+    Merge Klines into the monthly partitions of a symbol.
+
+    Bars already stored are overwritten by the new ones, so an incomplete last bar gets
+    replaced on the next sync. The time the last bar is written at is recorded, to tell
+    whether it was complete.
+
+    Args:
+        data (pd.DataFrame): The Klines data as returned by `aggregate_data`.
+        symbol (str): The symbol of the Klines data.
+        interval (str): The interval of the Klines data.
+        synced_from (datetime): The start time the data was requested from.
+    """
+    if data.empty:
+        months = []
+    else:
+        months = data.groupby(data["Timestamp"].dt.to_period("M"))
+    for month, month_df in months:
+        path = get_partition_path(symbol, interval, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            month_df = pd.concat([pd.read_parquet(path), month_df], ignore_index=True)
+            month_df = month_df.drop_duplicates(subset=["Timestamp"], keep="last")
+        month_df.sort_values("Timestamp").reset_index(drop=True).to_parquet(
+            path, index=False
+        )
+
+    meta = read_meta(symbol, interval)
+    if not meta or pd.Timestamp(synced_from) < pd.Timestamp(meta["synced_from"]):
+        meta["synced_from"] = synced_from.isoformat()
+    if not data.empty:
+        last_open = data["Timestamp"].max()
+        if not meta.get("last_open") or last_open >= pd.Timestamp(meta["last_open"]):
+            meta["last_open"] = last_open.isoformat()
+            meta["last_synced_at"] = datetime.utcnow().isoformat()
+    write_meta(symbol, interval, meta)
@@ -1,29 +1,259 @@
-import json
+import concurrent.futures
+import time
+from typing import Any, Dict, List, Tuple
 
+import orjson
+import pandas as pd
 from data_sources.exchange_data.binance import fetch_latest_exchange_data
 from data_sources.market_data.coingecko import fetch_latest_market_data
 from data_sources.news.crypto_news import fetch_latest_crypto_news
 from data_sources.social_media.reddit import fetch_posts
+from utils.chatgpt import chunk_text, num_tokens_from_string
 from utils.dynaconf_utils import settings
 
 
-def create_latest_features():
-    binance_dfs = {
-        k: v.astype({"Timestamp": "str"}).to_csv()
-        for k, v in fetch_latest_exchange_data().items()
-    }
-    coingecko_market_data = fetch_latest_market_data()
-    crypto_news_data = fetch_latest_crypto_news()
-    try:
-        reddit_posts = fetch_posts()
-    except Exception as e:
-        print(e)
-        raise e
-    return json.dumps(
+def round_floats(value: Any, digits: int) -> Any:
+    """
+    Round the floats of a nested value to a number of significant digits.
+
+    Args:
+        value (Any): The value, possibly a dict or list of values.
+        digits (int): The number of significant digits.
+
+    Returns:
+        Any: The value with rounded floats.
+    """
+    if isinstance(value, float):
+        return float(f"{value:.{digits}g}")
+    if isinstance(value, dict):
+        return {key: round_floats(item, digits) for key, item in value.items()}
+    if isinstance(value, list):
+        return [round_floats(item, digits) for item in value]
+    return value
+
+
+def select_fields(data: dict, fields: List[str], currencies: List[str]) -> dict:
+    """
+    Select fields of a dictionary, keeping only some currencies of per-currency fields.
+
+    Args:
+        data (dict): The data, e.g. the CoinGecko market data of a coin.
+        fields (List[str]): The fields to keep.
+        currencies (List[str]): The currencies to keep of fields valued per currency.
+
+    Returns:
+        dict: The selected fields that are present and not null.
+    """
+    selected = {}
+    for field in fields:
+        value = (data or {}).get(field)
+        if isinstance(value, dict):
+            value = {
+                currency: value[currency]
+                for currency in currencies
+                if currency in value
+            }
+        if value is not None and value != {}:
+            selected[field] = value
+    return selected
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """
+    Shorten a text to its leading paragraphs or sentences fitting a token budget.
+
+    Args:
+        text (str): The text.
+        max_tokens (int): The maximum number of tokens.
+
+    Returns:
+        str: The text itself if it fits, otherwise its leading part.
+    """
+    if not text:
+        return text
+    chunk, _ = next(chunk_text(text, max_tokens))
+    return chunk if len(chunk) == len(text) else f"{chunk.rstrip()}..."
+
+
+def compact_items(
+    items: List[dict], fields: List[str], text_fields: List[str], max_text_tokens: int
+) -> List[dict]:
+    return [
+        {
+            field: truncate_text(item[field], max_text_tokens)
+            if field in text_fields
+            else item[field]
+            for field in fields
+            if item.get(field) not in (None, "")
+        }
+        for item in items
+    ]
+
+
+def fit_token_budget(items: List[Any], token_budget: int) -> Tuple[List[Any], int]:
+    """
+    Keep the leading items of a list within a token budget.
+
+    Args:
+        items (List[Any]): The items, most relevant first.
+        token_budget (int): The maximum number of tokens of the serialized items.
+
+    Returns:
+        Tuple[List[Any], int]: The kept items and their number of tokens.
+    """
+    kept, num_tokens = [], 0
+    for item in items:
+        item_tokens = num_tokens_from_string(orjson.dumps(item).decode())
+        if num_tokens + item_tokens > token_budget:
+            break
+        kept.append(item)
+        num_tokens += item_tokens
+    return kept, num_tokens
+
+
+def compact_binance(data_per_symbol: Dict[str, pd.DataFrame]) -> List[dict]:
+    return [
+        {"symbol": symbol, "klines": df.astype({"Timestamp": "str"}).to_csv()}
+        for symbol, df in data_per_symbol.items()
+    ]
+
+
+def compact_coingecko(market_data: Dict[str, dict]) -> List[dict]:
+    fields = settings.FEATURE_FIELDS["coingecko"]
+    return [
         {
-            # "binance": binance_dfs,
-            "coingecko": coingecko_market_data,
-            "crypto-news": crypto_news_data,
-            "reddit": reddit_posts,
+            "id": symbol_id,
+            **{
+                group: select_fields(
+                    data.get(group), group_fields, settings.FEATURE_CURRENCIES
+                )
+                for group, group_fields in fields.items()
+            },
         }
+        for symbol_id, data in market_data.items()
+    ]
+
+
+def compact_crypto_news(news: List[dict]) -> List[dict]:
+    return compact_items(
+        news,
+        settings.FEATURE_FIELDS["crypto-news"],
+        settings.FEATURE_TEXT_FIELDS,
+        settings.FEATURE_TEXT_TOKEN_LIMIT,
+    )
+
+
+def compact_reddit(posts_per_subreddit: Dict[str, List[dict]]) -> List[dict]:
+    # Interleave the subreddits by rank, so that the budget keeps the top posts of each.
+    posts = sorted(
+        (
+            (rank, {"subreddit": subreddit, **post})
+            for subreddit, posts in posts_per_subreddit.items()
+            for rank, post in enumerate(
+                compact_items(
+                    posts,
+                    settings.FEATURE_FIELDS["reddit"],
+                    settings.FEATURE_TEXT_FIELDS,
+                    settings.FEATURE_TEXT_TOKEN_LIMIT,
+                )
+            )
+        ),
+        key=lambda ranked_post: ranked_post[0],
+    )
+    return [post for _, post in posts]
+
+
+# The function fetching the latest data of every source, and the function compacting it
+# into a list of feature items, most relevant first.
+FEATURE_SOURCES = {
+    "binance": (fetch_latest_exchange_data, compact_binance),
+    "coingecko": (fetch_latest_market_data, compact_coingecko),
+    "crypto-news": (fetch_latest_crypto_news, compact_crypto_news),
+    "reddit": (fetch_posts, compact_reddit),
+}
+
+
+def compact_features(data_per_source: Dict[str, Any]) -> Tuple[dict, Dict[str, int]]:
+    """
+    Compact the latest data of every source into the features of the inference prompt.
+
+    Only the configured fields and currencies are kept, floats are rounded, texts are cut to
+    their leading sentences and every source is cut to its token budget, most relevant items
+    first.
+
+    Args:
+        data_per_source (Dict[str, Any]): The latest data per source name, as returned by
+            the fetching function of the source in `FEATURE_SOURCES`.
+
+    Returns:
+        Tuple[dict, Dict[str, int]]: The features per source and their number of tokens.
+    """
+    features, num_tokens = {}, {}
+    for source, data in data_per_source.items():
+        _, compact = FEATURE_SOURCES[source]
+        features[source], num_tokens[source] = fit_token_budget(
+            round_floats(compact(data), settings.FEATURE_SIGNIFICANT_DIGITS),
+            settings.FEATURE_TOKEN_BUDGETS[source],
+        )
+    return features, num_tokens
+
+
+def fetch_latest_data(
+    source_names: List[str] = None, timeouts: Dict[str, float] = None
+) -> Dict[str, Any]:
+    """
+    Fetch the latest data of the feature sources concurrently.
+
+    Every source is fetched in its own thread and waited for until its timeout, counted from
+    the start of the fan-out. Sources failing or timing out are left out of the results.
+
+    Args:
+        source_names (List[str], optional): The names of the sources. Defaults to
+            `settings.FEATURE_SOURCES`.
+        timeouts (Dict[str, float], optional): The timeout in seconds per source. Defaults
+            to `settings.FEATURE_SOURCE_TIMEOUTS`.
+
+    Returns:
+        Dict[str, Any]: The latest data per source name, for the sources that succeeded.
+    """
+    source_names = settings.FEATURE_SOURCES if source_names is None else source_names
+    timeouts = timeouts or settings.FEATURE_SOURCE_TIMEOUTS
+    unknown = set(source_names) - set(FEATURE_SOURCES)
+    if unknown:
+        raise ValueError(f"Unknown feature sources {sorted(unknown)}.")
+    if not source_names:
+        return {}
+
+    started = time.monotonic()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(source_names))
+    futures = {
+        source: executor.submit(FEATURE_SOURCES[source][0]) for source in source_names
+    }
+    data_per_source = {}
+    try:
+        for source, future in futures.items():
+            timeout = timeouts.get(source)
+            try:
+                data_per_source[source] = future.result(
+                    timeout=None
+                    if timeout is None
+                    else max(started + timeout - time.monotonic(), 0)
+                )
+            except concurrent.futures.TimeoutError:
+                print(f"Fetching {source} timed out after {timeout}s, leaving it out.")
+            except Exception as e:
+                print(f"Fetching {source} failed, leaving it out: {e}")
+    finally:
+        # Do not wait for the sources that timed out.
+        executor.shutdown(wait=False, cancel_futures=True)
+    print(f"Fetched {sorted(data_per_source)} in {time.monotonic() - started:.1f}s.")
+    return data_per_source
+
+
+def create_latest_features():
+    features, num_tokens = compact_features(fetch_latest_data())
+    print(
+        f"Feature tokens per source: {num_tokens}, "
+        f"{sum(num_tokens.values())} tokens in total."
     )
+    return orjson.dumps(features).decode()
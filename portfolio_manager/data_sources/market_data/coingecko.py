@@ -1,25 +1,49 @@
-from typing import List
-from datetime import datetime
+import asyncio
+import math
+from pathlib import Path
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
 
+import httpx
+from utils.async_utils import TokenBucket
+from utils.cache_utils import get_cached_json
+from utils.dt_utils import datetime_range
 from utils.dynaconf_utils import settings
-from utils.httpx_utils import request
+from utils.httpx_utils import request, request_async, run_with_async_client
 
 URL = settings.COINGECKO_API
 
 
-def get_coins() -> List[dict]:
+def get_coins(force_refresh: bool = False) -> List[dict]:
     """
-    Get a list of coins asynchronously.
+    Get a list of coins, cached for `settings.METADATA_CACHE_TTL` seconds.
+
+    Args:
+        force_refresh (bool, optional): Whether to bypass the cache. Defaults to False.
 
     Returns:
         List[dict]: A list of coins.
     """
-    return request("GET", f"{URL}/coins/list")
+    return get_cached_json(
+        Path(settings.ROOT_PATH_FOR_DYNACONF)
+        / settings.METADATA_CACHE_DIR
+        / "coingecko_coins.json",
+        settings.METADATA_CACHE_TTL,
+        lambda: request("GET", f"{URL}/coins/list"),
+        force_refresh=force_refresh,
+    )
+
+
+def get_history_cache_ttl(dt: datetime) -> Optional[float]:
+    # The data of past dates never changes, so it is cached indefinitely.
+    return math.inf if dt.date() < datetime.utcnow().date() else None
 
 
 def get_history_data(id: str, dt: datetime) -> dict:
     """
-    Get historical data for a specific coin asynchronously.
+    Get historical data for a specific coin.
+
+    The data of past dates never changes, so it is cached on disk indefinitely.
 
     Args:
         id (str): The ID of the coin.
@@ -29,33 +53,113 @@ def get_history_data(id: str, dt: datetime) -> dict:
         dict: The historical data for the specified coin and date.
     """
     params = {"date": dt.strftime("%d-%m-%Y")}
-    return request("GET", f"{URL}/coins/{id}/history", params=params)
+    return request(
+        "GET",
+        f"{URL}/coins/{id}/history",
+        params=params,
+        cache_ttl=get_history_cache_ttl(dt),
+    )
 
 
-def fetch_market_data(dt: datetime):
-    symbol_ids = None
+async def get_history_data_async(id: str, dt: datetime, bucket: TokenBucket) -> dict:
+    """
+    Get historical data for a specific coin, fetching each past date only once.
+
+    The data of past dates is cached on disk without expiry, and only requests reaching
+    CoinGecko consume the per-minute budget.
+
+    Args:
+        id (str): The ID of the coin.
+        dt (datetime): The date for the historical data.
+        bucket (TokenBucket): The bucket enforcing the per-minute budget of CoinGecko.
+
+    Returns:
+        dict: The historical data for the specified coin and date.
+    """
+    params = {"date": dt.strftime("%d-%m-%Y")}
+    return await request_async(
+        "GET",
+        f"{URL}/coins/{id}/history",
+        params=params,
+        cache_ttl=get_history_cache_ttl(dt),
+        bucket=bucket,
+    )
+
+
+def get_symbol_ids() -> List[str]:
     if settings.COINGECKO_SYMBOL_IDS:
-        symbol_ids = settings.COINGECKO_SYMBOL_IDS
-    else:
-        coins = get_coins()
-        symbol_ids = list(map(lambda x: x["id"], coins))
-
-    results = {}
-    for symbol_id in symbol_ids:
-        data = get_history_data(symbol_id, dt)
+        return settings.COINGECKO_SYMBOL_IDS
+    return [coin["id"] for coin in get_coins()]
+
+
+async def fetch_market_data_async(
+    symbol_ids: List[str],
+    dates: List[datetime],
+    calls_per_minute: int = None,
+    max_concurrency: int = None,
+) -> Dict[datetime, dict]:
+    """
+    Fetch the historical data of many coins and dates concurrently.
+
+    Args:
+        symbol_ids (List[str]): The IDs of the coins.
+        dates (List[datetime]): The dates of the historical data.
+        calls_per_minute (int, optional): The CoinGecko request budget per minute. Defaults
+            to `settings.COINGECKO_CALLS_PER_MINUTE`.
+        max_concurrency (int, optional): The maximum number of requests in flight. Defaults
+            to `settings.COINGECKO_MAX_CONCURRENCY`.
+
+    Returns:
+        Dict[datetime, dict]: The market, community and public interest data per coin ID, per
+            date. Coins without data or whose request failed are left out.
+    """
+    bucket = TokenBucket(
+        calls_per_minute or settings.COINGECKO_CALLS_PER_MINUTE, period=60.0
+    )
+    semaphore = asyncio.Semaphore(max_concurrency or settings.COINGECKO_MAX_CONCURRENCY)
+
+    async def fetch(symbol_id: str, dt: datetime):
+        async with semaphore:
+            try:
+                return await get_history_data_async(symbol_id, dt, bucket)
+            except httpx.HTTPError as e:
+                print(f"Failed fetching history data for {symbol_id} on {dt}: {e}")
+                return None
+
+    keys = [(dt, symbol_id) for dt in dates for symbol_id in symbol_ids]
+    results = await asyncio.gather(*(fetch(symbol_id, dt) for dt, symbol_id in keys))
+
+    market_data = {dt: {} for dt in dates}
+    for (dt, symbol_id), data in zip(keys, results):
         if not data:
             continue
-        results.update(
-            {
-                symbol_id: {
-                    "market_data": data.get("market_data"),
-                    "community_data": data.get("community_data"),
-                    "public_interest_stats": data.get("public_interest_stats"),
-                }
-            }
-        )
-
-    return results
+        market_data[dt][symbol_id] = {
+            "market_data": data.get("market_data"),
+            "community_data": data.get("community_data"),
+            "public_interest_stats": data.get("public_interest_stats"),
+        }
+    return market_data
+
+
+def fetch_market_data_range(
+    start_dt: datetime, end_dt: datetime
+) -> Dict[datetime, dict]:
+    """
+    Fetch the historical data of the configured coins for every date in a range.
+
+    Args:
+        start_dt (datetime): The first date.
+        end_dt (datetime): The last date, included.
+
+    Returns:
+        Dict[datetime, dict]: The data per coin ID, per date.
+    """
+    dates = list(datetime_range(start_dt, end_dt, timedelta(days=1)))
+    return run_with_async_client(fetch_market_data_async(get_symbol_ids(), dates))
+
+
+def fetch_market_data(dt: datetime):
+    return fetch_market_data_range(dt, dt)[dt]
 
 
 def fetch_latest_market_data():
@@ -1,15 +1,16 @@
-import json
-import math
+import ast
+import asyncio
 import re
 from pathlib import Path
+from typing import Iterator, List, Tuple
 
 import orjson
-from data_sources.research.extract_pdf import process_files
+from data_sources.research.extract_pdf import iter_files
 from utils.chatgpt import (
-    chunk_string,
-    num_tokens_from_messages,
-    num_tokens_from_string,
-    prompt_chatgpt_stream,
+    ChatRateLimiter,
+    chunk_text,
+    count_prompt_tokens,
+    prompt_chatgpt_async,
 )
 from utils.dynaconf_utils import settings
 
@@ -55,83 +56,132 @@ def prepare_messages_json_format(text: str) -> dict:
     ]
 
 
-def mine_factors_from_files():
+def split_paper(text: str) -> List[Tuple[str, int]]:
+    """
+    Split the text of a paper into chunks fitting the token limit of the model.
+
+    Chunks are packed with whole paragraphs, or sentences of long paragraphs, up to the
+    token limit left by the prompt around them.
+
+    Args:
+        text (str): The text of the paper.
+
+    Returns:
+        List[Tuple[str, int]]: The chunks, or the whole text if it fits, with the number of
+            tokens of their prompt.
+    """
+    message_overhead = count_prompt_tokens(prepare_messages_python_computation)
+    print(f"{message_overhead=}")
+    chunks = [
+        (chunk, message_overhead + num_tokens)
+        for chunk, num_tokens in chunk_text(
+            text,
+            settings.CHATGPT_TOKEN_LIMIT - message_overhead,
+            overlap=settings.CHATGPT_CHUNK_OVERLAP_TOKENS,
+        )
+    ]
+    print(f"Chunked into {len(chunks)} batches.")
+    if settings.MINING_FACTOR_LIMIT_FOR_DEMO:
+        chunks = chunks[: settings.MINING_FACTOR_LIMIT_FOR_DEMO + 1]
+    return chunks
+
+
+def decode_factors(content: str) -> dict:
+    # TODO: Refine the parsing of the returned results, as JSON format is not always guaranteed.
+    try:
+        return orjson.loads(content)
+    except ValueError:
+        return ast.literal_eval(content)
+
+
+async def mine_factors_from_text(
+    text: str, num_tokens: int, rate_limiter: ChatRateLimiter, temperature: float = 1.0
+) -> dict:
+    """
+    Mine factors from a paper or chunk in two stages: extracting the factor computations,
+    then reformatting them as JSON.
+
+    Args:
+        text (str): The text of the paper or chunk.
+        num_tokens (int): The number of tokens of the extraction prompt.
+        rate_limiter (ChatRateLimiter): The budgets shared by concurrent requests.
+        temperature (float, optional): The temperature of the extraction. Defaults to 1.0.
+
+    Returns:
+        dict: The Python code per factor name.
+    """
     chatgpt_model = settings.CHATGPT_MODEL
-    token_limit = settings.CHATGPT_TOKEN_LIMIT
 
-    files_dir = Path(settings.ROOT_PATH_FOR_DYNACONF) / settings.RESEARCH_PAPERS_DIR
-    file_contents = process_files(files_dir.glob("*.pdf"))
+    messages = prepare_messages_python_computation(text)
+    print(f"Message tokens: {num_tokens}")
+    result = await prompt_chatgpt_async(
+        messages,
+        model=chatgpt_model,
+        temperature=temperature,
+        rate_limiter=rate_limiter,
+        num_tokens=num_tokens,
+    )
+    print(f"Returned message:\n{result['content']}")
+    result = await prompt_chatgpt_async(
+        prepare_messages_json_format(result["content"]),
+        model=chatgpt_model,
+        rate_limiter=rate_limiter,
+    )
+    print(f"Returned message:\n{result['content']}")
+    return decode_factors(result["content"])
+
+
+async def mine_factors_async(papers: Iterator[Tuple[Path, str]]) -> dict:
+    """
+    Mine factors from papers with concurrent requests.
+
+    Chunks are mined concurrently up to `settings.CHATGPT_MAX_CONCURRENCY` within the request
+    and token budgets per minute, so the two stages of different chunks overlap. Chunks of a
+    paper are scheduled as soon as the paper is yielded, while later papers are still parsed.
+
+    Args:
+        papers (Iterator[Tuple[Path, str]]): The path and text of every paper.
+
+    Returns:
+        dict: The Python code per factor name.
+    """
+    rate_limiter = ChatRateLimiter()
+    semaphore = asyncio.Semaphore(settings.CHATGPT_MAX_CONCURRENCY)
+
+    async def mine(text: str, num_tokens: int, temperature: float) -> dict:
+        async with semaphore:
+            try:
+                return await mine_factors_from_text(
+                    text, num_tokens, rate_limiter, temperature
+                )
+            except Exception as e:
+                print(e)
+                return {}
+
+    tasks = []
+    while True:
+        paper = await asyncio.to_thread(next, papers, None)
+        if paper is None:
+            break
+        file_path, text = paper
+        print(f"Mining factors from {file_path.name}")
+        chunks = split_paper(text)
+        # Whole papers are extracted with a lower temperature than chunks.
+        temperature = 0.75 if len(chunks) == 1 else 1.0
+        tasks += [
+            asyncio.create_task(mine(chunk, num_tokens, temperature))
+            for chunk, num_tokens in chunks
+        ]
 
     factors = {}
-    for text in file_contents:
-        messages = prepare_messages_python_computation(text)
-        num_token = num_tokens_from_messages(messages)
-        message_overhead = num_token - num_tokens_from_string(text)
-        print(f"{message_overhead=}")
-        print(f"Input has {num_token} tokens.")
-        if num_token > token_limit:
-            batch = math.ceil(num_token / (token_limit - message_overhead))
-            print(f"Chunking into {batch} batches.")
-            num_factors = 0
-            for sub_text in chunk_string(text, batch):
-                try:
-                    messages = prepare_messages_python_computation(sub_text)
-                    print(
-                        f"Chunked message tokens: {num_tokens_from_messages(messages)}"
-                    )
-                    result = prompt_chatgpt_stream(
-                        messages,
-                        model=chatgpt_model,
-                        # temperature=0.75,
-                    )
-                    print(f"Returned message:\n{result['content']}")
-                    result = prompt_chatgpt_stream(
-                        prepare_messages_json_format(result["content"]),
-                        model=chatgpt_model,
-                        # temperature=0.75,
-                    )
-                    print(f"Returned message:\n{result['content']}")
-                    # TODO: Refine the parsing of the returned results, as JSON format is not always guaranteed.
-                    try:
-                        decoded = orjson.loads(result["content"])
-                        # decoded = extract_json_from_string(result["content"])
-                    except ValueError:
-                        decoded = eval(result["content"])
-                    factors.update(decoded)
-                    num_factors += 1
-                except Exception as e:
-                    print(e)
-                    continue
-
-                if (
-                    settings.MINING_FACTOR_LIMIT_FOR_DEMO
-                    and num_factors > settings.MINING_FACTOR_LIMIT_FOR_DEMO
-                ):
-                    break
-            continue
+    for result in await asyncio.gather(*tasks):
+        factors.update(result)
+    return factors
 
-        try:
-            result = prompt_chatgpt_stream(
-                messages,
-                model=chatgpt_model,
-                temperature=0.75,
-            )
-            print(f"Returned message:\n{result['content']}")
-            result = prompt_chatgpt_stream(
-                prepare_messages_json_format(result["content"]),
-                model=chatgpt_model,
-                # temperature=0.75,
-            )
-            print(f"Returned message:\n{result['content']}")
-            # TODO: Refine the parsing of the returned results, as JSON format is not always guaranteed.
-            try:
-                decoded = orjson.loads(result["content"])
-            except ValueError:
-                decoded = eval(result["content"])
-            factors.update(decoded)
-            num_factors += 1
-        except Exception as e:
-            print(e)
+
+def mine_factors_from_files():
+    files_dir = Path(settings.ROOT_PATH_FOR_DYNACONF) / settings.RESEARCH_PAPERS_DIR
+    factors = asyncio.run(mine_factors_async(iter_files(files_dir.glob("*.pdf"))))
 
     for factor_name, factor_python in factors.items():
         with open(
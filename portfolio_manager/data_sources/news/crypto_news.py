@@ -1,11 +1,12 @@
+import asyncio
+import hashlib
 import httpx
-import pytz
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 
 from utils.dynaconf_utils import settings
 from utils.dt_utils import convert_to_utc
-from utils.httpx_utils import request
+from utils.httpx_utils import request_async, run_with_async_client
 
 URL = settings.CRYPTO_NEWS_API
 API_KEY = settings.CRYPTO_NEWS_API_KEY
@@ -14,55 +15,140 @@ DT_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
 DT_TZ = "US/Eastern"
 
 
-def get_crypto_news(symbols: List[str], start_dt: datetime, items: int = 50) -> dict:
+def get_url_hash(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def get_published_at(news: dict) -> datetime:
     """
-    Retrieve cryptocurrency news articles asynchronously.
+    Get the UTC publication time of a news article.
+
+    Args:
+        news (dict): The news article.
+
+    Returns:
+        datetime: The timezone-aware publication time in UTC.
+    """
+    return convert_to_utc(DT_TZ, datetime.strptime(news["date"], DT_FORMAT))
+
+
+async def get_crypto_news_async(
+    symbols: List[str],
+    start_dt: datetime,
+    items: int = 50,
+    max_concurrency: int = None,
+    limit: Optional[int] = None,
+    raise_errors: bool = False,
+) -> List[dict]:
+    """
+    Retrieve cryptocurrency news articles, newest first, back to a start datetime.
+
+    The first page tells the number of pages, after which the following pages are fetched
+    concurrently in waves of `max_concurrency` pages. No further wave is started once a page
+    ends before the start datetime, and the pages after it are discarded.
 
     Args:
         symbols (List[str]): List of symbols to filter the news.
         start_dt (datetime): Start datetime to retrieve news from.
-        items (int, optional): Number of news items to retrieve. Defaults to 50.
+        items (int, optional): Number of news items per page. Defaults to 50.
+        max_concurrency (int, optional): The number of pages fetched per wave. Defaults to
+            `settings.CRYPTO_NEWS_MAX_CONCURRENCY`.
+        limit (int, optional): The number of articles after which no further page is
+            fetched, or 0 to paginate back to the start datetime. Defaults to
+            `settings.CRYPTO_NEW_LIMIT_FOR_DEMO`.
+        raise_errors (bool, optional): Whether to raise when a page fails, instead of
+            returning the articles up to the failed page. Defaults to False.
 
     Returns:
-        dict: Dictionary containing the retrieved cryptocurrency news articles.
+        List[dict]: The retrieved news articles, up to the first failed page if any.
+
+    Raises:
+        httpx.HTTPError: If a page fails and `raise_errors` is set.
     """
     start_dt_utc = convert_to_utc(settings.TIME_ZONE, start_dt)
-
-    total_pages = 9999
+    max_concurrency = max_concurrency or settings.CRYPTO_NEWS_MAX_CONCURRENCY
+    limit = settings.CRYPTO_NEW_LIMIT_FOR_DEMO if limit is None else limit
     params = {
         "tickers": ",".join(symbols),
         "token": API_KEY,
         "items": items,
     }
 
+    async def fetch_page(page_num: int) -> List[dict]:
+        json_result = await request_async(
+            "GET", URL, params={**params, "page": page_num}
+        )
+        return json_result["data"]
+
+    def is_complete(page: List[dict]) -> bool:
+        return (not page or get_published_at(page[-1]) < start_dt_utc) or bool(
+            limit and len(json_results) >= limit
+        )
+
     json_results = []
     try:
-        page_num = 1
-        while page_num < total_pages:
-            params.update({"page": page_num})
-            json_result = request("GET", URL, params=params)
-            json_results += json_result["data"]
-            total_pages = json_result["total_pages"]
-            if (
-                convert_to_utc(
-                    DT_TZ, datetime.strptime(json_results[-1]["date"], DT_FORMAT)
-                )
-                < start_dt_utc
-            ) or (
-                settings.CRYPTO_NEW_LIMIT_FOR_DEMO
-                and len(json_results) >= settings.CRYPTO_NEW_LIMIT_FOR_DEMO
-            ):
-                break
-            page_num += 1
+        json_result = await request_async("GET", URL, params={**params, "page": 1})
+        json_results += json_result["data"]
+        total_pages = json_result["total_pages"]
+
+        page_num = 2
+        complete = is_complete(json_result["data"])
+        while not complete and page_num <= total_pages:
+            wave = range(page_num, min(page_num + max_concurrency, total_pages + 1))
+            pages = await asyncio.gather(
+                *(fetch_page(page_num) for page_num in wave), return_exceptions=True
+            )
+            for page in pages:
+                if isinstance(page, Exception):
+                    raise page
+                json_results += page
+                complete = is_complete(page)
+                if complete:
+                    break
+            page_num = wave.stop
 
     except httpx.HTTPError as e:
+        if raise_errors:
+            raise
         print(f"HTTP error occurred: {e}")
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"An error occurred: {e}")
 
     return json_results
 
 
+def get_crypto_news(
+    symbols: List[str],
+    start_dt: datetime,
+    items: int = 50,
+    limit: Optional[int] = None,
+    raise_errors: bool = False,
+) -> dict:
+    """
+    Retrieve cryptocurrency news articles, newest first, back to a start datetime.
+
+    Args:
+        symbols (List[str]): List of symbols to filter the news.
+        start_dt (datetime): Start datetime to retrieve news from.
+        items (int, optional): Number of news items per page. Defaults to 50.
+        limit (int, optional): The number of articles after which no further page is
+            fetched, or 0 to paginate back to the start datetime. Defaults to
+            `settings.CRYPTO_NEW_LIMIT_FOR_DEMO`.
+        raise_errors (bool, optional): Whether to raise when a page fails. Defaults to
+            False.
+
+    Returns:
+        dict: Dictionary containing the retrieved cryptocurrency news articles.
+    """
+    return run_with_async_client(
+        get_crypto_news_async(
+            symbols, start_dt, items=items, limit=limit, raise_errors=raise_errors
+        )
+    )
+
+
 def fetch_latest_crypto_news():
     symbols = settings.CRYPTO_NEWS_SYMBOLS
 
@@ -1,17 +1,32 @@
+import concurrent.futures
 import io
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
 
 import PyPDF2
+from utils.cache_utils import atomic_write_bytes, file_md5
+from utils.dynaconf_utils import settings
 
 
-def read_pdf(file_path: Path) -> str:
+def read_pdf(file_path: Path, start_page: int = 0, end_page: int = None) -> str:
+    """
+    Extract the text of a range of pages of a PDF file.
+
+    Args:
+        file_path (Path): The path of the PDF file.
+        start_page (int, optional): The first page to extract. Defaults to 0.
+        end_page (int, optional): The exclusive last page to extract. Defaults to the number
+            of pages.
+
+    Returns:
+        str: The text of the pages.
+    """
     with open(file_path, "rb") as file:
         pdf_reader = PyPDF2.PdfReader(file)
         num_pages = len(pdf_reader.pages)
         content = []
 
-        for page_num in range(num_pages):
+        for page_num in range(start_page, min(end_page or num_pages, num_pages)):
             page = pdf_reader.pages[page_num]
             text = page.extract_text()
             content.append(text)
@@ -19,11 +34,100 @@ def read_pdf(file_path: Path) -> str:
         return "".join(content)
 
 
-def process_files(file_paths: List[Path]) -> List[str]:
-    results = []
+def get_num_pages(file_path: Path) -> int:
+    with open(file_path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def get_text_cache_path(content_md5: str) -> Path:
+    return (
+        Path(settings.ROOT_PATH_FOR_DYNACONF)
+        / settings.PDF_TEXT_CACHE_DIR
+        / f"{content_md5}.txt"
+    )
+
+
+def iter_files(
+    file_paths: Iterable[Path], max_workers: int = None, pages_per_task: int = None
+) -> Iterator[Tuple[Path, str]]:
+    """
+    Extract the text of PDF files in a process pool, yielding each file once it is done.
 
+    The text is cached by the MD5 of the file content, so cached files are yielded first and
+    unchanged files are never parsed twice. Other files are split into tasks of
+    `pages_per_task` pages, and are yielded in the order they complete.
+
+    Args:
+        file_paths (Iterable[Path]): The paths of the PDF files.
+        max_workers (int, optional): The number of worker processes. Defaults to the CPU count.
+        pages_per_task (int, optional): The number of pages parsed per task. Defaults to
+            `settings.PDF_PAGES_PER_TASK`.
+
+    Yields:
+        Tuple[Path, str]: The path and text of every file.
+    """
+    pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+    pending = []
     for file_path in file_paths:
-        result = read_pdf(file_path)
-        results.append(result)
+        content_md5 = file_md5(file_path)
+        cache_path = get_text_cache_path(content_md5)
+        if cache_path.exists():
+            yield file_path, cache_path.read_text(encoding="utf-8")
+        else:
+            pending.append((file_path, cache_path))
+    if not pending:
+        return
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    completed = False
+    try:
+        futures = {}
+        parts = {}
+        for file_path, cache_path in pending:
+            try:
+                num_pages = get_num_pages(file_path)
+            except Exception as e:
+                print(f"Failed reading {file_path}: {e}")
+                continue
+            starts = range(0, max(num_pages, 1), pages_per_task)
+            parts[file_path] = [None] * len(starts)
+            for index, start_page in enumerate(starts):
+                future = executor.submit(
+                    read_pdf, file_path, start_page, start_page + pages_per_task
+                )
+                futures[future] = (file_path, cache_path, index)
+
+        for future in concurrent.futures.as_completed(futures):
+            file_path, cache_path, index = futures[future]
+            if file_path not in parts:
+                continue
+            try:
+                parts[file_path][index] = future.result()
+            except Exception as e:
+                print(f"Failed extracting text from {file_path}: {e}")
+                del parts[file_path]
+                continue
+            if all(part is not None for part in parts[file_path]):
+                text = "".join(parts.pop(file_path))
+                atomic_write_bytes(cache_path, text.encode("utf-8"))
+                yield file_path, text
+        completed = True
+    finally:
+        # If the consumer stops early, the queued extractions are cancelled, not waited for.
+        executor.shutdown(wait=completed, cancel_futures=not completed)
+
+
+def process_files(file_paths: Iterable[Path], max_workers: int = None) -> List[str]:
+    """
+    Extract the text of PDF files in parallel.
+
+    Args:
+        file_paths (Iterable[Path]): The paths of the PDF files.
+        max_workers (int, optional): The number of worker processes. Defaults to the CPU count.
 
-    return results
+    Returns:
+        List[str]: The text of every file that could be parsed, in the order of the paths.
+    """
+    file_paths = list(file_paths)
+    texts = dict(iter_files(file_paths, max_workers=max_workers))
+    return [texts[file_path] for file_path in file_paths if file_path in texts]
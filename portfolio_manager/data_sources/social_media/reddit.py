@@ -1,3 +1,8 @@
+import concurrent.futures
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
 import praw
 from utils.dynaconf_utils import settings
 
@@ -6,48 +11,205 @@ CLIENT_SECRET = settings.REDDIT_PERSONAL_USE_SECRET
 USERNAME = settings.REDDIT_USERNAME
 VERSION = "0.1.0"
 
-reddit = praw.Reddit(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    user_agent=f"linux:flowgpt:v{VERSION} (by /u/{USERNAME})",
-)
+POST_FIELDS = ["id", "score", "ups", "num_comments", "title", "selftext", "url"]
+
+_local = threading.local()
+
+
+def get_reddit_client() -> praw.Reddit:
+    """
+    Get the Reddit client of the current thread.
+
+    PRAW clients are not thread-safe, so every worker thread gets its own client.
+
+    Returns:
+        praw.Reddit: The client of the current thread.
+    """
+    if getattr(_local, "reddit", None) is None:
+        _local.reddit = praw.Reddit(
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            user_agent=f"linux:flowgpt:v{VERSION} (by /u/{USERNAME})",
+        )
+    return _local.reddit
 
 
-def get_popular_posts(subreddit_name: str, n: int = 3):
+def get_popular_posts(subreddit_name: str, n: int = 3, reddit: praw.Reddit = None):
     """
     Get popular posts from a subreddit.
 
     Args:
         subreddit_name (str): Name of the subreddit to retrieve posts from.
         n (int, optional): Number of posts to retrieve. Defaults to 10.
+        reddit (praw.Reddit, optional): The Reddit client. Defaults to the client of the
+            current thread.
 
     Returns:
         list: A list of dictionaries representing the popular posts.
     """
-    subreddit = reddit.subreddit(subreddit_name)
+    subreddit = (reddit or get_reddit_client()).subreddit(subreddit_name)
     return subreddit.hot(limit=n)
 
 
-def fetch_posts():
-    subreddits = settings.REDDIT_SUBREDDITS
+def get_new_posts(subreddit_name: str, n: int = 100, reddit: praw.Reddit = None):
+    """
+    Get the newest posts from a subreddit.
+
+    Args:
+        subreddit_name (str): Name of the subreddit to retrieve posts from.
+        n (int, optional): Number of posts to retrieve. Defaults to 100.
+        reddit (praw.Reddit, optional): The Reddit client. Defaults to the client of the
+            current thread.
+
+    Returns:
+        list: The posts, newest first.
+    """
+    subreddit = (reddit or get_reddit_client()).subreddit(subreddit_name)
+    return subreddit.new(limit=n)
+
+
+def serialize_post(post) -> dict:
+    post_data = {field: getattr(post, field, None) for field in POST_FIELDS}
+    post_data["created_at"] = datetime.utcfromtimestamp(post.created_utc)
+    return post_data
+
+
+def is_post_changed(post_data: dict, stored_data: Optional[dict]) -> bool:
+    """
+    Check whether a post is new, or its score, comments or text changed since it was stored.
+
+    Args:
+        post_data (dict): The serialized post.
+        stored_data (dict, optional): The stored data of the post, if any.
+
+    Returns:
+        bool: Whether the post should be stored.
+    """
+    if stored_data is None:
+        return True
+    return any(post_data.get(field) != stored_data.get(field) for field in POST_FIELDS)
+
+
+def map_subreddits(
+    func: Callable[[str], List[dict]],
+    subreddit_names: List[str],
+    max_workers: int = None,
+) -> Dict[str, List[dict]]:
+    """
+    Apply a fetching function to subreddits in a thread pool.
+
+    Args:
+        func (Callable[[str], List[dict]]): The function fetching the posts of a subreddit.
+        subreddit_names (List[str]): The names of the subreddits.
+        max_workers (int, optional): The number of worker threads. Defaults to
+            `settings.REDDIT_MAX_WORKERS`.
+
+    Returns:
+        Dict[str, List[dict]]: The posts per subreddit, leaving out the failed subreddits.
+    """
     results = {}
-    for subreddit in subreddits:
-        try:
-            results.update(
-                {
-                    subreddit: [
-                        {
-                            "score": post.__dict__["score"],
-                            "ups": post.__dict__["ups"],
-                            "title": post.__dict__["title"],
-                            "selftext": post.__dict__["selftext"],
-                        }
-                        for post in get_popular_posts(subreddit)
-                    ]
-                }
-            )
-        except Exception as e:
-            print(f"Failed fetching posts for subreddit: {subreddit}")
-            print(e)
-            continue
-    return results
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers or settings.REDDIT_MAX_WORKERS
+    ) as executor:
+        futures = {
+            executor.submit(func, subreddit_name): subreddit_name
+            for subreddit_name in subreddit_names
+        }
+        for future in concurrent.futures.as_completed(futures):
+            subreddit_name = futures[future]
+            try:
+                results[subreddit_name] = future.result()
+            except Exception as e:
+                print(f"Failed fetching posts for subreddit: {subreddit_name}")
+                print(e)
+    return {
+        subreddit_name: results[subreddit_name]
+        for subreddit_name in subreddit_names
+        if subreddit_name in results
+    }
+
+
+def fetch_subreddit_posts(
+    subreddit_name: str,
+    cursor: Optional[datetime],
+    limit: int = 100,
+    revisit_seconds: float = 0,
+    reddit: praw.Reddit = None,
+) -> List[dict]:
+    """
+    Fetch the posts of a subreddit created after its cursor.
+
+    The posts of the last `revisit_seconds` before the cursor are fetched again, so that
+    their score changes can be picked up.
+
+    Args:
+        subreddit_name (str): The name of the subreddit.
+        cursor (datetime, optional): The UTC creation time of the newest post seen.
+        limit (int, optional): The maximum number of posts. Defaults to 100.
+        revisit_seconds (float, optional): The seconds before the cursor to fetch again.
+            Defaults to 0.
+        reddit (praw.Reddit, optional): The Reddit client. Defaults to the client of the
+            current thread.
+
+    Returns:
+        List[dict]: The serialized posts, newest first.
+    """
+    since = cursor - timedelta(seconds=revisit_seconds) if cursor else None
+    posts = []
+    for post in get_new_posts(subreddit_name, n=limit, reddit=reddit):
+        post_data = serialize_post(post)
+        if since is not None and post_data["created_at"] <= since:
+            break
+        posts.append(post_data)
+    return posts
+
+
+def fetch_new_posts(
+    subreddit_names: List[str],
+    cursors: Dict[str, datetime],
+    limit: int = 100,
+    max_workers: int = None,
+    reddit: praw.Reddit = None,
+) -> Dict[str, List[dict]]:
+    """
+    Fetch the posts created after the cursor of every subreddit concurrently.
+
+    Args:
+        subreddit_names (List[str]): The names of the subreddits.
+        cursors (Dict[str, datetime]): The UTC creation time of the newest post seen per
+            subreddit. Subreddits without a cursor are fetched up to `limit` posts.
+        limit (int, optional): The maximum number of posts per subreddit. Defaults to 100.
+        max_workers (int, optional): The number of worker threads. Defaults to
+            `settings.REDDIT_MAX_WORKERS`.
+        reddit (praw.Reddit, optional): A Reddit client shared by the workers, e.g. a fake
+            replaying recorded responses. Defaults to a client per worker thread.
+
+    Returns:
+        Dict[str, List[dict]]: The serialized posts per subreddit, newest first.
+    """
+    return map_subreddits(
+        lambda subreddit_name: fetch_subreddit_posts(
+            subreddit_name,
+            cursors.get(subreddit_name),
+            limit=limit,
+            revisit_seconds=settings.REDDIT_REVISIT_SECONDS,
+            reddit=reddit,
+        ),
+        subreddit_names,
+        max_workers=max_workers,
+    )
+
+
+def fetch_posts(reddit: praw.Reddit = None):
+    return map_subreddits(
+        lambda subreddit_name: [
+            {
+                "score": post.score,
+                "ups": post.ups,
+                "title": post.title,
+                "selftext": post.selftext,
+            }
+            for post in get_popular_posts(subreddit_name, reddit=reddit)
+        ],
+        settings.REDDIT_SUBREDDITS,
+    )
@@ -0,0 +1,397 @@
+import asyncio
+import signal
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Tuple
+
+import pytz
+
+from data_sources.exchange_data.binance import (
+    fetch_exchange_data_range,
+    get_configured_symbols,
+    get_symbol_metadata,
+    store_exchange_data,
+)
+from data_sources.market_data.coingecko import fetch_market_data_range
+from data_sources.news.crypto_news import (
+    get_crypto_news,
+    get_published_at,
+    get_url_hash,
+)
+from data_sources.social_media.reddit import fetch_new_posts, is_post_changed
+from utils.db import (
+    close_connection_pool,
+    get_latest_value,
+    get_latest_values_by_column,
+    get_latest_values_by_key,
+    get_stored_data,
+    insert_raw_rows,
+    pooled_connection,
+)
+from utils.dynaconf_utils import settings
+
+
+@dataclass
+class SyncStats:
+    """
+    The counters of a synchronized source.
+
+    Attributes:
+        cycles (int): The number of completed cycles.
+        errors (int): The number of failed cycles.
+        rows (int): The number of rows written.
+        busy_seconds (float): The time spent fetching and writing.
+        last_rows (int): The number of rows written by the last cycle.
+        last_duration (float): The duration of the last cycle in seconds.
+        last_synced_at (datetime): The UTC time the last cycle completed.
+    """
+
+    cycles: int = 0
+    errors: int = 0
+    rows: int = 0
+    busy_seconds: float = 0.0
+    last_rows: int = 0
+    last_duration: float = 0.0
+    last_synced_at: Optional[datetime] = None
+
+    @property
+    def throughput(self) -> float:
+        """The rows written per second spent syncing."""
+        return self.rows / self.busy_seconds if self.busy_seconds else 0.0
+
+
+@dataclass
+class SyncSource:
+    """
+    A data source kept up to date by the `sync-data` daemon.
+
+    Attributes:
+        name (str): The name of the source, also used as the `source` column.
+        fetch (Callable): A blocking function fetching the data after a watermark. It returns
+            the data to store and the new watermark.
+        store (Callable): A blocking function storing the fetched data. It returns the number
+            of rows written.
+        get_watermark (Callable): A blocking function reading the watermark from the database.
+        interval (float): The seconds between the starts of two cycles.
+        watermark (datetime): The UTC time up to which the source has been synchronized.
+        stats (SyncStats): The counters of the source.
+    """
+
+    name: str
+    fetch: Callable[[datetime], Tuple[Any, datetime]]
+    store: Callable[[Any], int]
+    get_watermark: Callable[[], Optional[datetime]]
+    interval: float
+    watermark: Optional[datetime] = None
+    stats: SyncStats = field(default_factory=SyncStats)
+
+    @property
+    def lag(self) -> Optional[timedelta]:
+        """The time between now and the watermark."""
+        if self.watermark is None:
+            return None
+        return datetime.utcnow() - self.watermark
+
+
+def read_watermark(table: str, column: str, source: str) -> Optional[datetime]:
+    with pooled_connection() as connection:
+        return get_latest_value(connection, table, column, source)
+
+
+def write_raw_rows(
+    table: str,
+    rows: List[dict],
+    dedup_column: str = None,
+    update_on_conflict: bool = False,
+) -> int:
+    with pooled_connection() as connection:
+        return insert_raw_rows(
+            connection,
+            table,
+            rows,
+            dedup_column=dedup_column,
+            update_on_conflict=update_on_conflict,
+        )
+
+
+def fetch_binance(watermark: datetime) -> Tuple[dict, datetime]:
+    """
+    Fetch the hourly Klines of the configured symbols from their last stored bar onwards.
+
+    Every symbol is fetched from its own cursor, the time of its last stored bar, falling
+    back to the watermark, so a symbol without new bars does not hold back the others.
+    Symbols which are no longer trading are left out. The last stored bar is fetched
+    again, as it may have been incomplete.
+    """
+    with pooled_connection() as connection:
+        cursors = get_latest_values_by_column(
+            connection, "processed_market_data", "timestamp", "binance", "symbol"
+        )
+    metadata = get_symbol_metadata()
+    symbols_per_cursor = defaultdict(list)
+    for symbol in get_configured_symbols():
+        if metadata.get(symbol, {}).get("status", "TRADING") != "TRADING":
+            continue
+        symbols_per_cursor[cursors.get(symbol, watermark)].append(symbol)
+
+    end_dt = datetime.utcnow()
+    data = {}
+    for cursor, symbols in symbols_per_cursor.items():
+        data.update(fetch_exchange_data_range(symbols, cursor, end_dt))
+    last_bars = [
+        df["Timestamp"].max().to_pydatetime() for df in data.values() if not df.empty
+    ]
+    return data, max(last_bars + [watermark])
+
+
+def fetch_coingecko(watermark: datetime) -> Tuple[List[dict], datetime]:
+    """
+    Fetch the daily CoinGecko snapshots of the dates after the watermark up to today.
+    """
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    dt = watermark.replace(hour=0, minute=0, second=0, microsecond=0)
+    if dt == watermark:
+        dt += timedelta(days=1)
+    if dt > today:
+        return [], watermark
+    rows = [
+        {"title": symbol_id, "source": "coingecko", "published_at": dt, "data": data}
+        for dt, market_data in fetch_market_data_range(dt, today).items()
+        for symbol_id, data in market_data.items()
+    ]
+    return rows, today
+
+
+def fetch_crypto_news(watermark: datetime) -> Tuple[List[dict], datetime]:
+    """
+    Fetch the news published after the watermark.
+
+    All pages are fetched back to the watermark, and a failed page fails the cycle, so that
+    the watermark only advances past complete pages. Articles are identified by the hash of
+    their URL, so those already stored are skipped.
+    """
+    rows = []
+    for news in get_crypto_news(
+        settings.CRYPTO_NEWS_SYMBOLS,
+        start_dt=pytz.UTC.localize(watermark),
+        limit=0,
+        raise_errors=True,
+    ):
+        published_at = get_published_at(news).replace(tzinfo=None)
+        if published_at > watermark:
+            rows.append(
+                {
+                    "title": news["title"],
+                    "source": "crypto-news",
+                    "published_at": published_at,
+                    "data": news,
+                    "url_hash": get_url_hash(news["news_url"]),
+                }
+            )
+    return rows, max([row["published_at"] for row in rows], default=watermark)
+
+
+def fetch_reddit(watermark: datetime) -> Tuple[List[dict], datetime]:
+    """
+    Fetch the new or changed posts of the configured subreddits.
+
+    Every subreddit is fetched from its own cursor, the creation time of its newest stored
+    post, falling back to the watermark. Posts are identified by their ID, and only new
+    posts, or posts whose score, comments or text changed, are returned.
+    """
+    with pooled_connection() as connection:
+        cursors = get_latest_values_by_key(
+            connection, "social_media_feeds_raw", "published_at", "reddit", "subreddit"
+        )
+    posts = fetch_new_posts(
+        settings.REDDIT_SUBREDDITS,
+        {
+            subreddit: cursors.get(subreddit, watermark)
+            for subreddit in settings.REDDIT_SUBREDDITS
+        },
+        limit=settings.SYNC_REDDIT_POST_LIMIT,
+    )
+    rows = [
+        {
+            "title": post["title"],
+            "source": "reddit",
+            "published_at": post["created_at"],
+            "data": {"subreddit": subreddit, **post},
+            "post_id": post["id"],
+        }
+        for subreddit, subreddit_posts in posts.items()
+        for post in subreddit_posts
+    ]
+    with pooled_connection() as connection:
+        stored = get_stored_data(
+            connection,
+            "social_media_feeds_raw",
+            "post_id",
+            "reddit",
+            [row["post_id"] for row in rows],
+        )
+    rows = [
+        row for row in rows if is_post_changed(row["data"], stored.get(row["post_id"]))
+    ]
+    return rows, max([row["published_at"] for row in rows] + [watermark])
+
+
+def create_sync_sources(source_names: List[str] = None) -> List[SyncSource]:
+    """
+    Create the sources to synchronize.
+
+    Args:
+        source_names (List[str], optional): The names of the sources. Defaults to all sources
+            with an interval in `settings.SYNC_INTERVALS`.
+
+    Returns:
+        List[SyncSource]: The sources.
+    """
+    sources = {
+        "binance": SyncSource(
+            name="binance",
+            fetch=fetch_binance,
+            store=lambda data: store_exchange_data(data, source="binance"),
+            get_watermark=lambda: read_watermark(
+                "processed_market_data", "timestamp", "binance"
+            ),
+            interval=settings.SYNC_INTERVALS.get("binance"),
+        ),
+        "coingecko": SyncSource(
+            name="coingecko",
+            fetch=fetch_coingecko,
+            store=lambda rows: write_raw_rows("market_data_raw", rows),
+            get_watermark=lambda: read_watermark(
+                "market_data_raw", "published_at", "coingecko"
+            ),
+            interval=settings.SYNC_INTERVALS.get("coingecko"),
+        ),
+        "crypto-news": SyncSource(
+            name="crypto-news",
+            fetch=fetch_crypto_news,
+            store=lambda rows: write_raw_rows(
+                "news_raw", rows, dedup_column="url_hash"
+            ),
+            get_watermark=lambda: read_watermark(
+                "news_raw", "published_at", "crypto-news"
+            ),
+            interval=settings.SYNC_INTERVALS.get("crypto-news"),
+        ),
+        "reddit": SyncSource(
+            name="reddit",
+            fetch=fetch_reddit,
+            store=lambda rows: write_raw_rows(
+                "social_media_feeds_raw",
+                rows,
+                dedup_column="post_id",
+                update_on_conflict=True,
+            ),
+            get_watermark=lambda: read_watermark(
+                "social_media_feeds_raw", "published_at", "reddit"
+            ),
+            interval=settings.SYNC_INTERVALS.get("reddit"),
+        ),
+    }
+    if source_names is None:
+        source_names = [name for name in sources if sources[name].interval]
+    unknown = set(source_names) - set(sources)
+    if unknown:
+        raise ValueError(f"Unknown sources {sorted(unknown)}.")
+    return [sources[name] for name in source_names]
+
+
+def format_sync_stats(source: SyncSource) -> str:
+    lag = source.lag
+    return (
+        f"[{source.name}] watermark={source.watermark} "
+        f"lag={lag.total_seconds() / 60 if lag is not None else float('nan'):.1f}min "
+        f"last_rows={source.stats.last_rows} "
+        f"last_duration={source.stats.last_duration:.2f}s "
+        f"rows={source.stats.rows} cycles={source.stats.cycles} "
+        f"errors={source.stats.errors} "
+        f"throughput={source.stats.throughput:.1f}rows/s"
+    )
+
+
+async def wait_or_stop(stop: asyncio.Event, timeout: float):
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=max(timeout, 0))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_sync_source(source: SyncSource, stop: asyncio.Event):
+    """
+    Synchronize a source on its own schedule until stopped.
+
+    The blocking fetch and store functions run in worker threads, so all sources progress
+    concurrently on the same event loop.
+
+    Args:
+        source (SyncSource): The source to synchronize.
+        stop (asyncio.Event): The event stopping the loop.
+    """
+    if source.watermark is None:
+        try:
+            source.watermark = await asyncio.to_thread(source.get_watermark)
+        except Exception as e:
+            print(f"[{source.name}] Failed reading the watermark: {e}")
+    if source.watermark is None:
+        source.watermark = datetime.utcnow() - timedelta(
+            days=settings.SYNC_LOOKBACK_DAYS
+        )
+
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            data, watermark = await asyncio.to_thread(source.fetch, source.watermark)
+            rows = await asyncio.to_thread(source.store, data)
+            source.watermark = watermark
+            source.stats.cycles += 1
+            source.stats.rows += rows
+            source.stats.last_rows = rows
+            source.stats.last_synced_at = datetime.utcnow()
+        except Exception as e:
+            source.stats.errors += 1
+            print(f"[{source.name}] Sync failed: {e}")
+        source.stats.last_duration = time.monotonic() - started
+        source.stats.busy_seconds += source.stats.last_duration
+        print(format_sync_stats(source))
+        await wait_or_stop(stop, source.interval - source.stats.last_duration)
+
+
+async def report_sync_stats(sources: List[SyncSource], stop: asyncio.Event):
+    while not stop.is_set():
+        await wait_or_stop(stop, settings.SYNC_STATS_INTERVAL)
+        for source in sources:
+            print(format_sync_stats(source))
+
+
+async def sync_data(source_names: List[str] = None):
+    """
+    Keep the data sources up to date on independent schedules until interrupted.
+
+    Binance Klines are upserted into `processed_market_data`, which the backtests and the
+    inference read, rather than into a raw table, the other sources are appended to their
+    `*_raw` tables. Every cycle only fetches the data after the source's watermark.
+
+    Args:
+        source_names (List[str], optional): The names of the sources to synchronize.
+            Defaults to all sources with an interval in `settings.SYNC_INTERVALS`.
+    """
+    sources = create_sync_sources(source_names)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    print(f"Synchronizing {', '.join(source.name for source in sources)}.")
+    try:
+        await asyncio.gather(
+            *(run_sync_source(source, stop) for source in sources),
+            report_sync_stats(sources, stop),
+        )
+    finally:
+        close_connection_pool()
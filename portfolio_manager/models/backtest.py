@@ -1,40 +1,97 @@
-from importlib import import_module
-
 from typing import List
-import itertools
 
 import numpy as np
 import pandas as pd
 
+from models.factor_engine import (
+    compute_factor_cached,
+    cross_sectional_scaling,
+    get_data_fingerprint,
+)
+from models.metrics import compute_metrics, format_metrics
 from utils.dynaconf_utils import settings
 from utils.config_loader import ConfigLoader
 
 
-def min_max_scaling(df, column):
-    min_value = df[column].min()
-    max_value = df[column].max()
-    df[column] = (df[column] - min_value) / (max_value - min_value)
-    return df
+def rank_partial(df, factor_name, select_coin_num):
+    """
+    Rank the factor per timestamp with a partial sort, only for the rows that can be selected.
+
+    Every timestamp is a row of a (timestamp x symbol) matrix. `np.partition` finds the
+    `select_coin_num`-th smallest and largest values per row, and the exact ranks are only
+    counted for the candidates beyond these thresholds. Ties are ranked in order of
+    appearance, like `rank(method="first")`. Rows which are no candidates get NaN ranks.
+
+    Args:
+        df (pd.DataFrame): The data with the "timestamp" and factor columns.
+        factor_name (str): The name of the factor column.
+        select_coin_num (int): The number of symbols selected per side.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The "top" and "bottom" ranks of every row.
+    """
+    top = np.full(len(df), np.nan)
+    bottom = np.full(len(df), np.nan)
+    if df.empty:
+        return top, bottom
+
+    groups, _ = pd.factorize(df["timestamp"])
+    positions = df.groupby(groups).cumcount().to_numpy()
+    shape = (groups.max() + 1, positions.max() + 1)
+
+    values = np.full(shape, np.nan)
+    values[groups, positions] = df[factor_name].to_numpy(dtype=float)
+    rows = np.full(shape, -1)
+    rows[groups, positions] = np.arange(len(df))
+    valid = ~np.isnan(values)
+
+    kth = min(select_coin_num, shape[1]) - 1
+    low = np.partition(np.where(valid, values, np.inf), kth, axis=1)[:, [kth]]
+    high = -np.partition(np.where(valid, -values, np.inf), kth, axis=1)[:, [kth]]
+    candidate_groups, candidate_positions = np.nonzero(
+        valid & ((values <= low) | (values >= high))
+    )
+
+    candidate_values = values[candidate_groups, candidate_positions][:, None]
+    group_values = values[candidate_groups]
+    group_valid = valid[candidate_groups]
+    earlier = np.arange(shape[1])[None, :] < candidate_positions[:, None]
+    ties = group_valid & (group_values == candidate_values) & earlier
+    candidate_rows = rows[candidate_groups, candidate_positions]
+    bottom[candidate_rows] = (
+        (group_valid & (group_values < candidate_values)).sum(axis=1)
+        + ties.sum(axis=1)
+        + 1
+    )
+    top[candidate_rows] = (
+        (group_valid & (group_values > candidate_values)).sum(axis=1)
+        + ties.sum(axis=1)
+        + 1
+    )
+    return top, bottom
 
 
-def process_data(df, select_coin_num, factor_name, window):
+def process_data(df, select_coin_num, factor_name, window, partial_sort=False):
     df["timestamp"] = df["Timestamp"]
-    df["open"].fillna(method="ffill", inplace=True)
-    df["high"].fillna(method="ffill", inplace=True)
-    df["low"].fillna(method="ffill", inplace=True)
+    df["open"] = df["open"].fillna(method="ffill")
+    df["high"] = df["high"].fillna(method="ffill")
+    df["low"] = df["low"].fillna(method="ffill")
 
     df["Mtm"] = (df["close"] / df["close"].shift(window) - 1) * 100
 
-    df["bottom"] = df.groupby("timestamp")[factor_name].rank(method="first")
-    df["top"] = df.groupby("timestamp")[factor_name].rank(
-        method="first", ascending=False
-    )
+    if partial_sort:
+        # Cheaper for large universes, as only the selected ranks are needed.
+        df["top"], df["bottom"] = rank_partial(df, factor_name, select_coin_num)
+    else:
+        df["bottom"] = df.groupby("timestamp")[factor_name].rank(method="first")
+        df["top"] = df.groupby("timestamp")[factor_name].rank(
+            method="first", ascending=False
+        )
 
-    df["direction"] = df.apply(
-        lambda x: 1
-        if x["top"] <= select_coin_num
-        else (-1 if x["bottom"] <= select_coin_num else 0),
-        axis=1,
+    df["direction"] = np.select(
+        [df["top"] <= select_coin_num, df["bottom"] <= select_coin_num],
+        [1, -1],
+        default=0,
     )
     df = df[df["direction"] != 0]
 
@@ -62,112 +119,85 @@ def cal_ind(select_c):
     if select_c.empty:
         return None
 
-    results = pd.DataFrame()
-    results.loc[0, "cumulative_net_value"] = round(
-        select_c["capital_curve"].iloc[-1], 2
+    metrics = compute_metrics(
+        select_c["capital_curve"].to_numpy(),
+        select_c["return_rate"].to_numpy(),
+        select_c["candle_begin_time"].to_numpy(),
     )
+    select_c["max2here"] = metrics.max2here[0]
+    select_c["dd2here"] = metrics.dd2here[0]
 
-    select_c["max2here"] = select_c["capital_curve"].expanding().max()
-    select_c["dd2here"] = select_c["capital_curve"] / select_c["max2here"] - 1
+    return format_metrics(metrics), select_c
 
-    end_date, max_drawdown = select_c.sort_values(by=["dd2here"]).iloc[0][
-        ["candle_begin_time", "dd2here"]
-    ]
-    start_date = (
-        select_c[select_c["candle_begin_time"] <= end_date]
-        .sort_values(by="capital_curve", ascending=False)
-        .iloc[0]["candle_begin_time"]
-    )
 
-    results.loc[0, "maximum_drawdown"] = format(max_drawdown, ".2%")
-    results.loc[0, "maximum_drawdown_start_time"] = str(start_date)
-    results.loc[0, "maximum_drawdown_end_time"] = str(end_date)
+def add_holding_returns(select_coin, market_data_df, hold_hour):
+    """
+    Add the return over the holding period and the rebalancing offset of every selection.
 
-    results.loc[0, "profit_period_count"] = len(
-        select_c.loc[select_c["return_rate"] > 0]
-    )
-    results.loc[0, "loss_period_count"] = len(
-        select_c.loc[select_c["return_rate"] <= 0]
-    )
-    results.loc[0, "win_rate"] = format(
-        results.loc[0, "profit_period_count"] / len(select_c), ".2%"
-    )
-    results.loc[0, "average_period_return"] = format(
-        select_c["return_rate"].mean(), ".2%"
-    )
-    results.loc[0, "profit_loss_ratio"] = round(
-        select_c.loc[select_c["return_rate"] > 0]["return_rate"].mean()
-        / select_c.loc[select_c["return_rate"] <= 0]["return_rate"].mean()
-        * (-1),
-        2,
-    )
-    results.loc[0, "maximum_period_profit"] = format(
-        select_c["return_rate"].max(), ".2%"
-    )
-    results.loc[0, "maximum_period_loss"] = format(select_c["return_rate"].min(), ".2%")
+    The market data is expected to hold consecutive hourly bars per symbol.
 
-    results.loc[0, "maximum_continuous_profit_period_count"] = max(
-        [
-            len(list(v))
-            for k, v in itertools.groupby(
-                np.where(select_c["return_rate"] > 0, 1, np.nan)
-            )
-        ]
+    Args:
+        select_coin (pd.DataFrame): The selected coins as returned by `process_data`.
+        market_data_df (pd.DataFrame): The hourly market data the selection is based on.
+        hold_hour (str): The holding period, e.g. "24H".
+
+    Returns:
+        pd.DataFrame: The selections with "candle_begin_time", "offset" and "ret_next" columns.
+    """
+    hold = int(hold_hour[:-1])
+    prices = market_data_df[["symbol", "Timestamp", "close"]].sort_values(
+        by=["symbol", "Timestamp"]
     )
-    results.loc[0, "maximum_continuous_loss_period_count"] = max(
-        [
-            len(list(v))
-            for k, v in itertools.groupby(
-                np.where(select_c["return_rate"] <= 0, 1, np.nan)
-            )
-        ]
+    prices["ret_next"] = (
+        prices.groupby("symbol")["close"].shift(-hold) / prices["close"] - 1
     )
+    prices.rename(columns={"Timestamp": "timestamp"}, inplace=True)
 
-    time_during = (
-        select_c.iloc[-1]["candle_begin_time"] - select_c.iloc[0]["candle_begin_time"]
+    select_coin = select_coin.merge(
+        prices[["symbol", "timestamp", "ret_next"]],
+        on=["symbol", "timestamp"],
+        how="left",
     )
-    total_seconds = time_during.days * 24 * 3600 + time_during.seconds
-    if total_seconds == 0:
-        annual_return = 0
-    else:
-        final_r = round(select_c["capital_curve"].iloc[-1], 2)
-        annual_return = pow(final_r, 24 * 3600 * 365 / total_seconds) - 1
-
-    results.loc[0, "annual_return"] = str(round(annual_return, 2)) + " times"
-    results.loc[0, "annual_return_drawdown_ratio"] = round(
-        (annual_return) / abs(max_drawdown), 2
+    select_coin["candle_begin_time"] = select_coin["timestamp"]
+    select_coin["offset"] = (
+        (select_coin["timestamp"] - pd.Timestamp(0)) // pd.Timedelta(hours=1) % hold
     )
-
-    return results, select_c
+    select_coin.dropna(subset=["ret_next"], inplace=True)
+    select_coin.reset_index(drop=True, inplace=True)
+    return select_coin
 
 
-def evaluate(df, c_rate, select_coin_num):
+def evaluate(df, c_rate, select_coin_num, by="candle_begin_time"):
     df["return_rate1"] = (
         -(1 * c_rate) + 1 * (1 + df["ret_next"] * df["direction"]) * (1 - c_rate) - 1
     )
     select_coin = pd.DataFrame()
-    select_coin["return_rate"] = df.groupby("candle_begin_time")[
-        "return_rate1"
-    ].sum() / (select_coin_num * 2)
+    select_coin["return_rate"] = df.groupby(by)["return_rate1"].sum() / (
+        select_coin_num * 2
+    )
     select_coin.reset_index(inplace=True)
     return select_coin
 
 
-def backtest(hold_hour, c_rate, select_coin_num, select_coin):
+def backtest(hold_hour, c_rate, select_coin_num, select_coin, verbose=True):
     select_coin["candle_begin_time"] = pd.to_datetime(select_coin["candle_begin_time"])
 
-    temp = pd.DataFrame()
-    for offset, g_df in select_coin.groupby("offset"):
-        print(offset)
-        g_df.sort_values(by="candle_begin_time", inplace=True)
-        g_df.reset_index(drop=True, inplace=True)
-        select_c = evaluate(g_df, c_rate, select_coin_num)
-        select_c["capital_curve"] = (select_c["return_rate"] + 1).cumprod()
-        select_c["offset"] = offset
-        rtn, select_c = cal_ind(select_c)
-        print(rtn)
-        # temp = temp.append(rtn, ignore_index=True)
-        temp = pd.concat([temp, rtn], ignore_index=True)
+    # The periods of every offset are laid out left-aligned in an (offset x period)
+    # matrix, so all offsets are scored in one pass.
+    offset_df = evaluate(
+        select_coin, c_rate, select_coin_num, by=["offset", "candle_begin_time"]
+    )
+    offsets, offset_index = np.unique(offset_df["offset"], return_inverse=True)
+    positions = offset_df.groupby("offset").cumcount().to_numpy()
+    shape = (len(offsets), positions.max() + 1)
+    return_rates = np.full(shape, np.nan)
+    return_rates[offset_index, positions] = offset_df["return_rate"]
+    times = np.full(shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+    times[offset_index, positions] = offset_df["candle_begin_time"]
+    capital_curves = np.nancumprod(return_rates + 1, axis=1)
+    temp = format_metrics(compute_metrics(capital_curves, return_rates, times))
+    if verbose:
+        print(temp.set_index(pd.Index(offsets, name="offset")))
 
     all_select_df = evaluate(select_coin, c_rate, select_coin_num)
     all_select_df["return_rate"] = all_select_df["return_rate"] / int(hold_hour[:-1])
@@ -175,23 +205,33 @@ def backtest(hold_hour, c_rate, select_coin_num, select_coin):
     rtn, select_c = cal_ind(all_select_df)
     # temp = temp.append(rtn)
     temp = pd.concat([temp, rtn], ignore_index=True)
-    print(
-        'Average "Annualized Return/Drawdown Ratio" for all offsets: ',
-        temp["annual_return_drawdown_ratio"][:-1].mean(),
-    )
+    if verbose:
+        print(
+            'Average "Annualized Return/Drawdown Ratio" for all offsets: ',
+            temp["annual_return_drawdown_ratio"][:-1].mean(),
+        )
     return temp
 
 
-def compute_factors(market_data_df: pd.DataFrame, factor_weights: dict, window: int):
-    market_data_df["combined_factor"] = 0
+def compute_factors(
+    market_data_df: pd.DataFrame,
+    factor_weights: dict,
+    window: int,
+    engine: str = "wide",
+):
+    data_fingerprint = get_data_fingerprint(market_data_df)
+    market_data_df["combined_factor"] = 0.0
     for factor_name, weight in factor_weights.items():
-        factor_module = import_module(f"models.factors.{factor_name}")
-        market_data_df[factor_name] = factor_module.signal(
-            df=market_data_df, window=window, factor_name=factor_name
+        factor = compute_factor_cached(
+            market_data_df,
+            factor_name,
+            window,
+            engine=engine,
+            data_fingerprint=data_fingerprint,
+        )
+        market_data_df["combined_factor"] += (
+            cross_sectional_scaling(factor, market_data_df["Timestamp"]) * weight
         )
-        market_data_df = min_max_scaling(market_data_df, factor_name)
-        market_data_df["combined_factor"] += market_data_df[factor_name] * weight
-        market_data_df.drop(columns=[factor_name], inplace=True)
 
     return market_data_df
 
@@ -207,10 +247,26 @@ def get_strategy_backtest_results(
         raise Exception(
             f"Specified strategy configuration {strategy_config} not found."
         )
-    coin_num = strategy_conf["coin_num"]
-    window = strategy_conf["window"]
-    hold_hour = strategy_conf["hold_hour"]
-    c_rate = strategy_conf["c_rate"]
+    return run_strategy_backtest(
+        market_data_df,
+        factor_weights,
+        coin_num=strategy_conf["coin_num"],
+        window=strategy_conf["window"],
+        hold_hour=strategy_conf["hold_hour"],
+        c_rate=strategy_conf["c_rate"],
+    )
+
+
+def run_strategy_backtest(
+    market_data_df: pd.DataFrame,
+    factor_weights: dict,
+    coin_num: int,
+    window: int,
+    hold_hour: str,
+    c_rate: float,
+    verbose: bool = True,
+):
     ranking_df = compute_factors(market_data_df, factor_weights, window)
-    ranking_df = process_data(ranking_df, coin_num, "combined_factor", window)
-    return backtest(hold_hour, c_rate, coin_num, ranking_df)
+    select_coin = process_data(ranking_df, coin_num, "combined_factor", window)
+    select_coin = add_holding_returns(select_coin, ranking_df, hold_hour)
+    return backtest(hold_hour, c_rate, coin_num, select_coin, verbose=verbose)
@@ -0,0 +1,263 @@
+import hashlib
+import io
+from importlib import import_module
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from utils.cache_utils import atomic_write_bytes, enforce_disk_budget, file_md5, touch
+from utils.dynaconf_utils import settings
+
+PANEL_COLUMNS = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "quote_volume",
+    "trade_num",
+    "taker_buy_base_asset_volume",
+    "taker_buy_quote_asset_volume",
+]
+
+
+class WidePanel(dict):
+    """
+    A dictionary of (timestamp x symbol) DataFrames, one per market data column.
+
+    It supports the subset of the DataFrame interface used by the `signal` functions in
+    `models.factors`, so every rolling and EWM window runs over all symbols at once and
+    never crosses from one symbol into another.
+    """
+
+    def drop(self, columns, inplace=False):
+        panel = self if inplace else WidePanel(self)
+        for column in [columns] if isinstance(columns, str) else columns:
+            panel.pop(column)
+        return None if inplace else panel
+
+
+def get_factor_module(factor_name: str):
+    return import_module(f"models.factors.{factor_name}")
+
+
+def extract_factor(result, factor_name: str):
+    """
+    Extract the factor values from the return value of a `signal` function.
+
+    Args:
+        result: The panel with the factor column, or the factor values themselves.
+        factor_name (str): The name of the factor.
+
+    Returns:
+        The factor values.
+    """
+    if isinstance(result, (dict, pd.DataFrame)) and factor_name in result:
+        return result[factor_name]
+    return result
+
+
+def compute_factor_wide(
+    market_data_df: pd.DataFrame, factor_name: str, window: int
+) -> np.ndarray:
+    """
+    Compute a factor on a (timestamp x symbol) panel.
+
+    Args:
+        market_data_df (pd.DataFrame): The long format market data of all symbols.
+        factor_name (str): The name of the factor module in `models.factors`.
+        window (int): The window of the factor.
+
+    Returns:
+        np.ndarray: The factor values aligned with the rows of the market data.
+    """
+    columns = [column for column in PANEL_COLUMNS if column in market_data_df]
+    wide = market_data_df.pivot(index="Timestamp", columns="symbol", values=columns)
+    panel = WidePanel({column: wide[column] for column in columns})
+
+    result = extract_factor(
+        get_factor_module(factor_name).signal(
+            df=panel, window=window, factor_name=factor_name
+        ),
+        factor_name,
+    )
+    result = pd.DataFrame(result).reindex(
+        index=wide.index, columns=wide[columns[0]].columns
+    )
+
+    rows = result.index.get_indexer(market_data_df["Timestamp"])
+    cols = result.columns.get_indexer(market_data_df["symbol"])
+    return result.to_numpy(dtype=float)[rows, cols]
+
+
+def compute_factor_grouped(
+    market_data_df: pd.DataFrame, factor_name: str, window: int
+) -> np.ndarray:
+    """
+    Compute a factor separately on the time series of every symbol.
+
+    Args:
+        market_data_df (pd.DataFrame): The long format market data of all symbols.
+        factor_name (str): The name of the factor module in `models.factors`.
+        window (int): The window of the factor.
+
+    Returns:
+        np.ndarray: The factor values aligned with the rows of the market data.
+    """
+    factor_module = get_factor_module(factor_name)
+    values = pd.Series(np.nan, index=market_data_df.index)
+    for _, symbol_df in market_data_df.groupby("symbol", sort=False, observed=True):
+        symbol_df = symbol_df.sort_values("Timestamp")
+        result = extract_factor(
+            factor_module.signal(
+                df=symbol_df.copy(), window=window, factor_name=factor_name
+            ),
+            factor_name,
+        )
+        values.loc[symbol_df.index] = np.asarray(result, dtype=float)
+    return values.to_numpy()
+
+
+def compute_factor(
+    market_data_df: pd.DataFrame, factor_name: str, window: int, engine: str = "wide"
+) -> np.ndarray:
+    """
+    Compute a factor per symbol.
+
+    The "wide" engine pivots the market data to (timestamp x symbol) frames and runs the
+    `signal` function once over all symbols. It falls back to the "groupby" engine, which
+    runs the `signal` function per symbol, for factors using other DataFrame features. Both
+    agree as long as every symbol has a bar at every timestamp.
+
+    Args:
+        market_data_df (pd.DataFrame): The long format market data of all symbols.
+        factor_name (str): The name of the factor module in `models.factors`.
+        window (int): The window of the factor.
+        engine (str, optional): Either "wide" or "groupby". Defaults to "wide".
+
+    Returns:
+        np.ndarray: The factor values aligned with the rows of the market data.
+    """
+    if engine == "wide":
+        try:
+            return compute_factor_wide(market_data_df, factor_name, window)
+        except Exception as e:
+            print(f"Falling back to per-symbol computation of {factor_name}: {e}")
+    elif engine != "groupby":
+        raise ValueError(f"Unknown factor engine {engine}.")
+    return compute_factor_grouped(market_data_df, factor_name, window)
+
+
+def get_data_fingerprint(market_data_df: pd.DataFrame) -> str:
+    """
+    Compute a fingerprint of the market data the factors are computed from.
+
+    Args:
+        market_data_df (pd.DataFrame): The long format market data of all symbols.
+
+    Returns:
+        str: The MD5 hex digest of the symbol, timestamp and market data columns.
+    """
+    columns = ["symbol", "Timestamp"] + [
+        column for column in PANEL_COLUMNS if column in market_data_df
+    ]
+    hashes = pd.util.hash_pandas_object(market_data_df[columns], index=False)
+    return hashlib.md5(hashes.to_numpy().tobytes()).hexdigest()
+
+
+def get_factor_cache_path(
+    factor_name: str, window: int, engine: str, data_fingerprint: str
+) -> Path:
+    """
+    Get the cache entry of a factor's values.
+
+    The key combines the MD5 of the factor source file, the window, the engine and the
+    fingerprint of the market data, so editing a factor or the data invalidates the entry.
+
+    Args:
+        factor_name (str): The name of the factor module in `models.factors`.
+        window (int): The window of the factor.
+        engine (str): The engine computing the factor.
+        data_fingerprint (str): The fingerprint of the market data.
+
+    Returns:
+        Path: The path of the cached `.npy` file.
+    """
+    source_md5 = file_md5(Path(get_factor_module(factor_name).__file__))
+    key = hashlib.md5(
+        f"{source_md5}:{window}:{engine}:{data_fingerprint}".encode()
+    ).hexdigest()
+    return (
+        Path(settings.ROOT_PATH_FOR_DYNACONF)
+        / settings.FACTOR_CACHE_DIR
+        / f"{factor_name}-{key}.npy"
+    )
+
+
+def compute_factor_cached(
+    market_data_df: pd.DataFrame,
+    factor_name: str,
+    window: int,
+    engine: str = "wide",
+    data_fingerprint: str = None,
+) -> np.ndarray:
+    """
+    Compute a factor per symbol, reusing the values cached on disk if available.
+
+    The cache evicts the least recently used entries once it exceeds
+    `settings.FACTOR_CACHE_MAX_MB`.
+
+    Args:
+        market_data_df (pd.DataFrame): The long format market data of all symbols.
+        factor_name (str): The name of the factor module in `models.factors`.
+        window (int): The window of the factor.
+        engine (str, optional): Either "wide" or "groupby". Defaults to "wide".
+        data_fingerprint (str, optional): The fingerprint of the market data, computed if
+            not provided.
+
+    Returns:
+        np.ndarray: The factor values aligned with the rows of the market data.
+    """
+    if not settings.FACTOR_CACHE_ENABLED:
+        return compute_factor(market_data_df, factor_name, window, engine=engine)
+
+    data_fingerprint = data_fingerprint or get_data_fingerprint(market_data_df)
+    cache_path = get_factor_cache_path(factor_name, window, engine, data_fingerprint)
+    if cache_path.exists():
+        try:
+            values = np.load(cache_path)
+            touch(cache_path)
+            return values
+        except (OSError, ValueError) as e:
+            print(f"Failed reading cached factor {cache_path}: {e}")
+
+    values = compute_factor(market_data_df, factor_name, window, engine=engine)
+    buffer = io.BytesIO()
+    np.save(buffer, values)
+    atomic_write_bytes(cache_path, buffer.getvalue())
+    enforce_disk_budget(
+        cache_path.parent, settings.FACTOR_CACHE_MAX_MB * 1024 * 1024, "*.npy"
+    )
+    return values
+
+
+def cross_sectional_scaling(values: np.ndarray, timestamps: pd.Series) -> np.ndarray:
+    """
+    Min-max scale factor values across the symbols of every timestamp.
+
+    Timestamps where all symbols share the same value are scaled to 0.5, missing values
+    stay missing.
+
+    Args:
+        values (np.ndarray): The factor values.
+        timestamps (pd.Series): The timestamp of every value.
+
+    Returns:
+        np.ndarray: The scaled values in [0, 1], NaN where the values are NaN.
+    """
+    grouped = pd.Series(values, index=timestamps.index).groupby(timestamps.to_numpy())
+    min_values = grouped.transform("min").to_numpy()
+    value_range = grouped.transform("max").to_numpy() - min_values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaled = (values - min_values) / value_range
+    return np.where(np.isnan(values), np.nan, np.where(value_range == 0, 0.5, scaled))
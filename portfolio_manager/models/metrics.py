@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_YEAR = 24 * 3600 * 365
+
+
+@dataclass
+class BacktestMetrics:
+    """
+    The performance metrics of one or more capital curves.
+
+    Every field holds one value per capital curve. The drawdown times are the candle begin
+    times of the maximum drawdown's peak and trough.
+    """
+
+    cumulative_net_value: np.ndarray
+    maximum_drawdown: np.ndarray
+    maximum_drawdown_start_time: np.ndarray
+    maximum_drawdown_end_time: np.ndarray
+    profit_period_count: np.ndarray
+    loss_period_count: np.ndarray
+    win_rate: np.ndarray
+    average_period_return: np.ndarray
+    profit_loss_ratio: np.ndarray
+    maximum_period_profit: np.ndarray
+    maximum_period_loss: np.ndarray
+    maximum_continuous_profit_period_count: np.ndarray
+    maximum_continuous_loss_period_count: np.ndarray
+    annual_return: np.ndarray
+    annual_return_drawdown_ratio: np.ndarray
+    max2here: np.ndarray
+    dd2here: np.ndarray
+
+
+def longest_run(mask: np.ndarray) -> np.ndarray:
+    """
+    Get the length of the longest run of True values in every row.
+
+    Args:
+        mask (np.ndarray): A 2-D boolean array.
+
+    Returns:
+        np.ndarray: The longest run length per row.
+    """
+    if mask.shape[1] == 0:
+        return np.zeros(mask.shape[0], dtype=int)
+    positions = np.arange(1, mask.shape[1] + 1)
+    last_break = np.maximum.accumulate(np.where(mask, 0, positions), axis=1)
+    return (positions - last_break).max(axis=1)
+
+
+def compute_metrics(
+    capital_curves: np.ndarray, return_rates: np.ndarray, times: np.ndarray
+) -> BacktestMetrics:
+    """
+    Compute the backtest metrics of many capital curves in one vectorized pass.
+
+    Curves of different lengths are padded at the end with NaN return rates.
+
+    Args:
+        capital_curves (np.ndarray): The capital curves, shaped (periods,) or (curves, periods).
+        return_rates (np.ndarray): The return rate of every period, shaped like the curves.
+        times (np.ndarray): The datetime64 candle begin time of every period, shaped like the
+            curves or (periods,) if shared by all curves.
+
+    Returns:
+        BacktestMetrics: The metrics with one value per curve.
+    """
+    capital = np.atleast_2d(np.asarray(capital_curves, dtype=float))
+    returns = np.atleast_2d(np.asarray(return_rates, dtype=float))
+    times = np.broadcast_to(np.asarray(times, dtype="datetime64[ns]"), capital.shape)
+    rows = np.arange(capital.shape[0])
+
+    valid = ~np.isnan(returns)
+    capital = np.where(valid, capital, np.nan)
+    num_periods = valid.sum(axis=1)
+    last = capital.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    final_value = np.round(capital[rows, last], 2)
+
+    max2here = np.fmax.accumulate(capital, axis=1)
+    dd2here = capital / max2here - 1
+    end = np.nanargmin(np.where(valid, dd2here, np.inf), axis=1)
+    max_drawdown = dd2here[rows, end]
+    # The peak is the first period reaching the running maximum at the trough.
+    start = np.argmax(
+        (capital == max2here[rows, end][:, None])
+        & (np.arange(capital.shape[1]) <= end[:, None]),
+        axis=1,
+    )
+
+    profit = valid & (returns > 0)
+    loss = valid & (returns <= 0)
+    profit_count = profit.sum(axis=1)
+    loss_count = loss.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_mean = np.where(profit, returns, 0).sum(axis=1) / profit_count
+        loss_mean = np.where(loss, returns, 0).sum(axis=1) / loss_count
+        profit_loss_ratio = np.round(profit_mean / loss_mean * (-1), 2)
+
+        total_seconds = (times[rows, last] - times[:, 0]) // np.timedelta64(1, "s")
+        annual_return = np.where(
+            total_seconds == 0,
+            0.0,
+            np.power(final_value, SECONDS_PER_YEAR / total_seconds) - 1,
+        )
+        annual_return_drawdown_ratio = np.round(annual_return / np.abs(max_drawdown), 2)
+
+    return BacktestMetrics(
+        cumulative_net_value=final_value,
+        maximum_drawdown=max_drawdown,
+        maximum_drawdown_start_time=times[rows, start],
+        maximum_drawdown_end_time=times[rows, end],
+        profit_period_count=profit_count,
+        loss_period_count=loss_count,
+        win_rate=profit_count / num_periods,
+        average_period_return=np.nanmean(returns, axis=1),
+        profit_loss_ratio=profit_loss_ratio,
+        maximum_period_profit=np.nanmax(returns, axis=1),
+        maximum_period_loss=np.nanmin(returns, axis=1),
+        # Periods on the other side count as runs of one, so every curve has a run.
+        maximum_continuous_profit_period_count=np.maximum(longest_run(profit), 1),
+        maximum_continuous_loss_period_count=np.maximum(longest_run(loss), 1),
+        annual_return=annual_return,
+        annual_return_drawdown_ratio=annual_return_drawdown_ratio,
+        max2here=max2here,
+        dd2here=dd2here,
+    )
+
+
+def format_metrics(metrics: BacktestMetrics) -> pd.DataFrame:
+    """
+    Format backtest metrics as a table with one row per capital curve.
+
+    Args:
+        metrics (BacktestMetrics): The metrics as returned by `compute_metrics`.
+
+    Returns:
+        pd.DataFrame: The formatted metrics.
+    """
+    return pd.DataFrame(
+        {
+            "cumulative_net_value": metrics.cumulative_net_value,
+            "maximum_drawdown": [
+                format(value, ".2%") for value in metrics.maximum_drawdown
+            ],
+            "maximum_drawdown_start_time": [
+                str(pd.Timestamp(value))
+                for value in metrics.maximum_drawdown_start_time
+            ],
+            "maximum_drawdown_end_time": [
+                str(pd.Timestamp(value)) for value in metrics.maximum_drawdown_end_time
+            ],
+            "profit_period_count": metrics.profit_period_count,
+            "loss_period_count": metrics.loss_period_count,
+            "win_rate": [format(value, ".2%") for value in metrics.win_rate],
+            "average_period_return": [
+                format(value, ".2%") for value in metrics.average_period_return
+            ],
+            "profit_loss_ratio": metrics.profit_loss_ratio,
+            "maximum_period_profit": [
+                format(value, ".2%") for value in metrics.maximum_period_profit
+            ],
+            "maximum_period_loss": [
+                format(value, ".2%") for value in metrics.maximum_period_loss
+            ],
+            "maximum_continuous_profit_period_count": (
+                metrics.maximum_continuous_profit_period_count
+            ),
+            "maximum_continuous_loss_period_count": (
+                metrics.maximum_continuous_loss_period_count
+            ),
+            "annual_return": [
+                f"{round(value, 2)} times" for value in metrics.annual_return
+            ],
+            "annual_return_drawdown_ratio": metrics.annual_return_drawdown_ratio,
+        }
+    )
@@ -0,0 +1,205 @@
+import concurrent.futures
+import itertools
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.backtest import run_strategy_backtest
+from utils.config_loader import ConfigLoader
+
+SWEEP_PARAMETERS = ["coin_num", "window", "hold_hour", "c_rate"]
+
+# Panel attached from shared memory in every worker process.
+_worker_panel = None
+_worker_segments = []
+
+
+class SharedPanel:
+    """
+    A DataFrame whose columns are stored in shared memory blocks.
+
+    Numeric columns are shared as they are, datetime columns as int64 nanoseconds, and other
+    columns as integer codes of their categories. Categorical columns stay categorical in the
+    workers, other columns are rebuilt as objects. Only the small layout description is
+    pickled to the worker processes, which rebuild the DataFrame from the shared buffers.
+
+    Attributes:
+        layout (List[Tuple]): The (column, segment name, dtype, length, kind, categories) of
+            every shared column.
+        segments (List[shared_memory.SharedMemory]): The shared memory blocks owned by this panel.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.layout = []
+        self.segments = []
+        for column in df.columns:
+            series = df[column]
+            categories = None
+            if pd.api.types.is_datetime64_any_dtype(series):
+                kind = "datetime"
+                values = series.to_numpy(dtype="datetime64[ns]").view("int64")
+            elif isinstance(series.dtype, pd.CategoricalDtype):
+                kind = "categorical"
+                values = series.cat.codes.to_numpy()
+                categories = list(series.cat.categories)
+            elif pd.api.types.is_numeric_dtype(series):
+                kind = "numeric"
+                values = series.to_numpy()
+            else:
+                kind = "category"
+                codes, categories = pd.factorize(series)
+                values = codes
+                categories = list(categories)
+
+            segment = shared_memory.SharedMemory(
+                create=True, size=max(values.nbytes, 1)
+            )
+            np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf)[:] = values
+            self.segments.append(segment)
+            self.layout.append(
+                (column, segment.name, values.dtype.str, len(values), kind, categories)
+            )
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+def attach_panel(layout: List[Tuple]) -> Tuple[pd.DataFrame, list]:
+    """
+    Rebuild a DataFrame from the shared memory blocks of a `SharedPanel`.
+
+    Args:
+        layout (List[Tuple]): The layout of the shared panel.
+
+    Returns:
+        Tuple[pd.DataFrame, list]: The read-only DataFrame and the attached memory blocks.
+    """
+    columns = {}
+    segments = []
+    for column, name, dtype, length, kind, categories in layout:
+        # The workers share the resource tracker of the parent process, which owns the
+        # block and unlinks it, so the block must stay registered.
+        segment = shared_memory.SharedMemory(name=name)
+        segments.append(segment)
+        values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=segment.buf)
+        values.flags.writeable = False
+        if kind == "datetime":
+            columns[column] = values.view("datetime64[ns]")
+        elif kind == "categorical":
+            columns[column] = pd.Categorical.from_codes(values, categories)
+        elif kind == "category":
+            columns[column] = np.asarray(
+                pd.Categorical.from_codes(values, categories), dtype=object
+            )
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns), segments
+
+
+def _init_worker(layout: List[Tuple]):
+    global _worker_panel, _worker_segments
+    _worker_panel, _worker_segments = attach_panel(layout)
+
+
+def _run_sweep_point(parameters: dict) -> dict:
+    # The backtest only adds columns, so a shallow copy keeps the shared columns as they are.
+    results = run_strategy_backtest(
+        _worker_panel.copy(deep=False), verbose=False, **parameters
+    )
+    # The last row holds the metrics of all offsets combined.
+    metrics = results.iloc[-1].to_dict()
+    metrics["offset_average_annual_return_drawdown_ratio"] = results[
+        "annual_return_drawdown_ratio"
+    ][:-1].mean()
+    return {**parameters, **metrics}
+
+
+def expand_sweep_grid(sweep_conf: dict) -> List[dict]:
+    """
+    Expand a sweep configuration into the list of its parameter combinations.
+
+    Args:
+        sweep_conf (dict): The grids of `coin_num`, `window`, `hold_hour` and `c_rate`, and a
+            list of `factor_weights` dictionaries. Scalars are treated as a grid of one value.
+
+    Returns:
+        List[dict]: The keyword arguments of `run_strategy_backtest` for every combination.
+    """
+    grids = [
+        sweep_conf[name] if isinstance(sweep_conf[name], list) else [sweep_conf[name]]
+        for name in SWEEP_PARAMETERS
+    ]
+    factor_weights = sweep_conf["factor_weights"]
+    if isinstance(factor_weights, dict):
+        factor_weights = [factor_weights]
+    return [
+        {"factor_weights": dict(weights), **dict(zip(SWEEP_PARAMETERS, values))}
+        for weights in factor_weights
+        for values in itertools.product(*grids)
+    ]
+
+
+def run_parameter_sweep(
+    market_data_df: pd.DataFrame, sweep_conf: dict, max_workers: int = None
+) -> pd.DataFrame:
+    """
+    Backtest every parameter combination of a sweep in parallel across processes.
+
+    The market data is placed in shared memory once, and each worker process attaches to it
+    on start-up instead of receiving a pickled copy per task.
+
+    Args:
+        market_data_df (pd.DataFrame): The hourly market data of all symbols.
+        sweep_conf (dict): The sweep configuration, see `expand_sweep_grid`.
+        max_workers (int, optional): The number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        pd.DataFrame: The `cal_ind` metrics per combination, ranked by the annualized return
+            to drawdown ratio.
+    """
+    sweep_points = expand_sweep_grid(sweep_conf)
+    print(f"Running {len(sweep_points)} backtests.")
+
+    panel = SharedPanel(market_data_df.reset_index(drop=True))
+    results = []
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(panel.layout,)
+        ) as executor:
+            futures = {
+                executor.submit(_run_sweep_point, parameters): parameters
+                for parameters in sweep_points
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"Backtest failed for {futures[future]}: {e}")
+    finally:
+        panel.close()
+
+    if not results:
+        return pd.DataFrame()
+    results_df = pd.DataFrame(results)
+    results_df.sort_values(
+        by="annual_return_drawdown_ratio", ascending=False, inplace=True
+    )
+    results_df.reset_index(drop=True, inplace=True)
+    return results_df
+
+
+def get_strategy_sweep_results(
+    market_data_df: pd.DataFrame,
+    sweep_config: str,
+    config_loader: ConfigLoader,
+    max_workers: int = None,
+) -> pd.DataFrame:
+    sweep_conf = config_loader.get_config(sweep_config)
+    if not sweep_conf:
+        raise Exception(f"Specified sweep configuration {sweep_config} not found.")
+    return run_parameter_sweep(market_data_df, sweep_conf, max_workers=max_workers)
@@ -0,0 +1,326 @@
+import math
+import pickle
+from collections import deque
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from models.factor_engine import cross_sectional_scaling
+from utils.cache_utils import atomic_write_bytes
+
+
+def divide(numerator: float, denominator: float) -> float:
+    """
+    Divide like pandas does, returning inf or NaN instead of raising on zero.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(numerator) / np.float64(denominator))
+
+
+class StreamingEWM:
+    """
+    An exponentially weighted mean, equivalent to `ewm(span=span, adjust=False).mean()`.
+
+    Missing values are handled like pandas with `ignore_na=False`: they are skipped, but
+    still decay the weight of the previous observations.
+    """
+
+    def __init__(self, span: int, min_periods: int = 0):
+        self.alpha = 2 / (span + 1)
+        self.min_periods = max(min_periods, 1)
+        self.weighted = math.nan
+        self.old_weight = 1.0
+        self.num_obs = 0
+
+    def update(self, value: float) -> float:
+        is_observation = not math.isnan(value)
+        self.num_obs += is_observation
+        if math.isnan(self.weighted):
+            if is_observation:
+                self.weighted = value
+        else:
+            self.old_weight *= 1 - self.alpha
+            if is_observation:
+                if self.weighted != value:
+                    self.weighted = (
+                        self.old_weight * self.weighted + self.alpha * value
+                    ) / (self.old_weight + self.alpha)
+                self.old_weight = 1.0
+        return self.weighted if self.num_obs >= self.min_periods else math.nan
+
+
+class StreamingRollingMean:
+    """
+    A rolling mean over the last `window` values, ignoring missing values.
+    """
+
+    def __init__(self, window: int, min_periods: int = 1):
+        self.values = deque(maxlen=window)
+        self.min_periods = min_periods
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, value: float) -> float:
+        if len(self.values) == self.values.maxlen:
+            expired = self.values[0]
+            if not math.isnan(expired):
+                self.total -= expired
+                self.count -= 1
+        self.values.append(value)
+        if not math.isnan(value):
+            self.total += value
+            self.count += 1
+        if self.count < self.min_periods or self.count == 0:
+            return math.nan
+        return self.total / self.count
+
+
+class StreamingRollingExtreme:
+    """
+    A rolling maximum or minimum over the last `window` values, kept in a monotonic deque.
+    """
+
+    def __init__(self, window: int, min_periods: int = 1, maximum: bool = True):
+        self.window = window
+        self.min_periods = min_periods
+        self.maximum = maximum
+        self.candidates = deque()
+        self.observations = deque()
+        self.index = 0
+
+    def update(self, value: float) -> float:
+        expired_before = self.index - self.window + 1
+        while self.candidates and self.candidates[0][0] < expired_before:
+            self.candidates.popleft()
+        while self.observations and self.observations[0] < expired_before:
+            self.observations.popleft()
+
+        if not math.isnan(value):
+            while self.candidates and (
+                self.candidates[-1][1] <= value
+                if self.maximum
+                else self.candidates[-1][1] >= value
+            ):
+                self.candidates.pop()
+            self.candidates.append((self.index, value))
+            self.observations.append(self.index)
+        self.index += 1
+
+        if len(self.observations) < self.min_periods or not self.candidates:
+            return math.nan
+        return self.candidates[0][1]
+
+
+class StreamingShift:
+    """
+    The value `periods` updates ago, equivalent to `shift(periods)`.
+    """
+
+    def __init__(self, periods: int):
+        self.values = deque(maxlen=periods + 1)
+
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        if len(self.values) < self.values.maxlen:
+            return math.nan
+        return self.values[0]
+
+
+class ManualFactor0:
+    """
+    Streaming version of `models.factors.manual_factor_0`.
+    """
+
+    def __init__(self, window: int):
+        self.mean = StreamingEWM(window, min_periods=1)
+        self.volhigh = StreamingRollingExtreme(window, maximum=True)
+        self.vollow = StreamingRollingExtreme(window, maximum=False)
+        self.regvol_mean = StreamingRollingMean(window)
+        self.bias2_mean = StreamingRollingMean(window)
+
+    def update(self, bar: dict) -> float:
+        bias = divide(bar["close"], self.mean.update(bar["close"])) - 1
+        volhigh = self.volhigh.update(bar["volume"])
+        vollow = self.vollow.update(bar["volume"])
+        regvol = divide(bar["volume"] - vollow, volhigh - vollow)
+        bias2 = bias * self.regvol_mean.update(regvol)
+        return self.bias2_mean.update(bias2)
+
+
+class ManualFactor1:
+    """
+    Streaming version of `models.factors.manual_factor_1`.
+    """
+
+    def __init__(self, window: int):
+        self.close_shift = StreamingShift(window)
+        self.high_max = StreamingRollingExtreme(window, maximum=True)
+        self.low_min = StreamingRollingExtreme(window, maximum=False)
+        self.hourly_volatility_mean = StreamingRollingMean(window)
+        self.mtm_mean = StreamingRollingMean(window)
+
+    def update(self, bar: dict) -> float:
+        mtm = divide(bar["close"], self.close_shift.update(bar["close"])) - 1
+        volatility = (
+            self.high_max.update(bar["high"]) - self.low_min.update(bar["low"]) - 1
+        )
+        hourly_volatility = divide(bar["high"], bar["low"]) - 1
+        hourly_volatility_mean = self.hourly_volatility_mean.update(hourly_volatility)
+        return self.mtm_mean.update(mtm) * (volatility + hourly_volatility_mean)
+
+
+class ManualFactor2:
+    """
+    Streaming version of `models.factors.manual_factor_2`.
+    """
+
+    def __init__(self, window: int):
+        self.oma = StreamingEWM(window)
+        self.hma = StreamingEWM(window)
+        self.ima = StreamingEWM(window)
+        self.cma = StreamingEWM(window)
+        self.ma = StreamingEWM(window)
+        self.md = StreamingEWM(window)
+
+    def update(self, bar: dict) -> float:
+        tp = (
+            self.oma.update(bar["open"])
+            + self.hma.update(bar["high"])
+            + self.ima.update(bar["low"])
+            + self.cma.update(bar["close"])
+        ) / 4
+        ma = self.ma.update(tp)
+        md = self.md.update(abs(tp - ma))
+        return divide(tp - ma, md + 1e-8)
+
+
+STREAMING_FACTORS = {
+    "manual_factor_0": ManualFactor0,
+    "manual_factor_1": ManualFactor1,
+    "manual_factor_2": ManualFactor2,
+}
+
+
+class StreamingFactorEngine:
+    """
+    Keeps the rolling state of factors per symbol and updates them one bar at a time.
+
+    Attributes:
+        factor_names (List[str]): The factors with a streaming implementation to compute.
+        window (int): The window of the factors.
+        states (Dict[str, dict]): The factor states per symbol.
+        last_timestamps (Dict[str, pd.Timestamp]): The time of the last bar per symbol.
+        values (Dict[str, dict]): The latest factor values per symbol.
+    """
+
+    def __init__(self, factor_names: List[str], window: int):
+        missing = [name for name in factor_names if name not in STREAMING_FACTORS]
+        if missing:
+            raise ValueError(
+                f"No streaming implementation for {missing}, the supported factors are "
+                f"{sorted(STREAMING_FACTORS)}."
+            )
+        self.factor_names = factor_names
+        self.window = window
+        self.states = {}
+        self.last_timestamps = {}
+        self.values = {}
+
+    def update(self, symbol: str, bar: dict) -> Dict[str, float]:
+        """
+        Update the factors of a symbol with a new closed bar.
+
+        Bars which are not newer than the last bar of the symbol are ignored.
+
+        Args:
+            symbol (str): The symbol of the bar.
+            bar (dict): The bar with "Timestamp", "open", "high", "low", "close" and "volume".
+
+        Returns:
+            Dict[str, float]: The latest factor values of the symbol.
+        """
+        timestamp = pd.Timestamp(bar["Timestamp"])
+        last_timestamp = self.last_timestamps.get(symbol)
+        if last_timestamp is not None and timestamp <= last_timestamp:
+            return self.values[symbol]
+
+        if symbol not in self.states:
+            self.states[symbol] = {
+                name: STREAMING_FACTORS[name](self.window) for name in self.factor_names
+            }
+        bar = {key: float(value) for key, value in bar.items() if key != "Timestamp"}
+        self.values[symbol] = {
+            name: state.update(bar) for name, state in self.states[symbol].items()
+        }
+        self.last_timestamps[symbol] = timestamp
+        return self.values[symbol]
+
+    def update_from_frame(self, market_data_df: pd.DataFrame):
+        """
+        Update the factors with all bars of a long format market data frame.
+
+        Args:
+            market_data_df (pd.DataFrame): The market data with "symbol" and "Timestamp" columns.
+        """
+        columns = ["Timestamp", "open", "high", "low", "close", "volume"]
+        for symbol, symbol_df in market_data_df.groupby(
+            "symbol", sort=False, observed=True
+        ):
+            for bar in symbol_df.sort_values("Timestamp")[columns].to_dict("records"):
+                self.update(symbol, bar)
+
+    def latest(self) -> pd.DataFrame:
+        """
+        Get the latest factor values of all symbols.
+
+        Returns:
+            pd.DataFrame: The factor values indexed by symbol.
+        """
+        return pd.DataFrame.from_dict(
+            self.values, orient="index", columns=self.factor_names
+        )
+
+    def score(self, factor_weights: dict) -> pd.Series:
+        """
+        Combine the latest factor values, min-max scaled across symbols.
+
+        Args:
+            factor_weights (dict): The weight of every factor.
+
+        Returns:
+            pd.Series: The combined factor per symbol, sorted descending.
+        """
+        latest = self.latest()
+        symbols = pd.Series(0, index=latest.index)
+        combined = pd.Series(0.0, index=latest.index)
+        for factor_name, weight in factor_weights.items():
+            combined += (
+                cross_sectional_scaling(latest[factor_name].to_numpy(), symbols)
+                * weight
+            )
+        return combined.sort_values(ascending=False)
+
+    def snapshot(self, path: Path):
+        """
+        Save the state of the engine to disk.
+
+        Args:
+            path (Path): The file to write.
+        """
+        atomic_write_bytes(path, pickle.dumps(self))
+
+    @staticmethod
+    def restore(path: Path) -> "StreamingFactorEngine":
+        """
+        Load the state of an engine from disk.
+
+        Args:
+            path (Path): The file written by `snapshot`.
+
+        Returns:
+            StreamingFactorEngine: The restored engine.
+        """
+        with open(path, "rb") as file:
+            return pickle.load(file)
@@ -1,6 +1,5 @@
 import asyncio
 import concurrent.futures
-import math
 from datetime import datetime
 from pathlib import Path
 from time import sleep
@@ -9,7 +8,10 @@ from typing import List
 import click
 import pandas as pd
 from data_sources.exchange_data.binance import (
+    build_panel,
     fetch_exchange_data,
+    fetch_exchange_data_range,
+    get_configured_symbols,
     get_klines,
     load_symbols,
 )
@@ -17,11 +19,11 @@ from data_sources.fuse_data import create_latest_features
 from data_sources.mine_factors import mine_factors_from_files
 from data_sources.social_media.reddit import get_popular_posts
 from models.backtest import get_strategy_backtest_results
+from models.streaming_factors import StreamingFactorEngine
 from utils.chatgpt import (
-    chunk_string,
-    num_tokens_from_messages,
+    chunk_text,
+    count_prompt_tokens,
     prompt_chatgpt_stream,
-    num_tokens_from_string,
     prompt_chatgpt,
 )
 from utils.config_loader import ConfigLoader
@@ -54,19 +56,22 @@ def seek_advise_for_factor_combinations(features: str, factors: List[str]):
     chatgpt_model = settings.CHATGPT_MODEL
     token_limit = settings.CHATGPT_TOKEN_LIMIT
 
-    messages = prepare_messages(features, factors)
-    num_token = num_tokens_from_messages(messages)
-    message_overhead = num_token - num_tokens_from_string(features)
+    message_overhead = count_prompt_tokens(lambda text: prepare_messages(text, factors))
     print(f"{message_overhead=}")
-    print(f"Input has {num_token} tokens.")
-    if num_token > token_limit:
-        batch = math.ceil(num_token / (token_limit - message_overhead))
-        print(f"Chunking into {batch} batches.")
+    chunks = list(
+        chunk_text(
+            features,
+            token_limit - message_overhead,
+            overlap=settings.CHATGPT_CHUNK_OVERLAP_TOKENS,
+        )
+    )
+    if len(chunks) > 1:
+        print(f"Chunking into {len(chunks)} batches.")
         requests = 0
-        for sub_text in chunk_string(features, batch):
+        for chunk, num_tokens in chunks:
             try:
-                messages = prepare_messages(sub_text, factors)
-                print(f"Chunked message tokens: {num_tokens_from_messages(messages)}")
+                messages = prepare_messages(chunk, factors)
+                print(f"Chunked message tokens: {message_overhead + num_tokens}")
                 result = prompt_chatgpt_stream(
                     messages,
                     model=chatgpt_model,
@@ -80,6 +85,8 @@ def seek_advise_for_factor_combinations(features: str, factors: List[str]):
                 break
         return
 
+    messages = prepare_messages(features, factors)
+    print(f"Input has {message_overhead + sum(n for _, n in chunks)} tokens.")
     try:
         result = prompt_chatgpt_stream(
             messages,
@@ -102,10 +109,55 @@ def strategy_inference(start_dt, end_dt, config_loader):
 
     seek_advise_for_factor_combinations(aggregated_info, factors)
 
-    history_data_per_symbol = fetch_exchange_data(start_dt, end_dt)
-    history_data = pd.DataFrame()
-    for symbol, symbol_df in history_data_per_symbol.items():
-        # history_data = history_data.append(symbol_df, ignore_index=True)
-        history_data = pd.concat([history_data, symbol_df], ignore_index=True)
+    history_data = build_panel(fetch_exchange_data(start_dt, end_dt))
 
     # get_strategy_backtest_results()
+
+
+def score_latest_bars(
+    start_dt: datetime, factor_weights: dict, window: int
+) -> pd.Series:
+    """
+    Score the symbols on their latest closed hourly bars with the streaming factor engine.
+
+    The engine state is restored from its snapshot on disk and only updated with the bars
+    since then. Without a usable snapshot, it is warmed up on the history from `start_dt`.
+
+    Args:
+        start_dt (datetime): The start date of the warm-up history.
+        factor_weights (dict): The weight of every factor.
+        window (int): The window of the factors.
+
+    Returns:
+        pd.Series: The combined factor per symbol, sorted descending.
+    """
+    state_path = (
+        Path(settings.ROOT_PATH_FOR_DYNACONF) / settings.STREAMING_FACTOR_STATE_PATH
+    )
+    factor_names = list(factor_weights)
+    engine = None
+    if state_path.exists():
+        try:
+            engine = StreamingFactorEngine.restore(state_path)
+        except Exception as e:
+            print(f"Failed restoring the streaming factor state {state_path}: {e}")
+    if (
+        engine is None
+        or engine.factor_names != factor_names
+        or engine.window != window
+        or not engine.last_timestamps
+    ):
+        engine = StreamingFactorEngine(factor_names, window)
+    else:
+        start_dt = min(engine.last_timestamps.values()).to_pydatetime()
+        start_dt = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    now = datetime.utcnow()
+    bars = build_panel(
+        fetch_exchange_data_range(get_configured_symbols(), start_dt, now)
+    )
+    # The bar of the current hour is still open.
+    bars = bars[bars["Timestamp"] + pd.Timedelta(hours=1) <= now]
+    engine.update_from_frame(bars)
+    engine.snapshot(state_path)
+    return engine.score(factor_weights)
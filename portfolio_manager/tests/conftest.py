@@ -0,0 +1,35 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Placeholder credentials, the tests never reach the real services.
+for name in [
+    "CHATGPT_API_KEY",
+    "CRYPTO_NEWS_API_KEY",
+    "REDDIT_PERSONAL_USE_SCRIPT",
+    "REDDIT_PERSONAL_USE_SECRET",
+    "REDDIT_USERNAME",
+]:
+    os.environ.setdefault(name, "test")
+
+from utils.dynaconf_utils import settings  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def override_settings():
+    previous = {}
+
+    def override(**values):
+        for key, value in values.items():
+            previous.setdefault(key, settings.get(key))
+            settings.set(key, value)
+
+    yield override
+    for key, value in previous.items():
+        settings.set(key, value)
@@ -0,0 +1,73 @@
+import pytest
+
+from utils import chatgpt
+
+
+class PrefixEncoder:
+    """
+    An encoder whose first token spans up to three characters and the others one, so that a
+    text encoded whole has more tokens than its parts encoded separately.
+    """
+
+    def encode(self, text: str) -> list:
+        return [text[:3]] + list(text[3:]) if text else []
+
+    def decode(self, tokens: list) -> str:
+        return "".join(tokens)
+
+    def decode_bytes(self, tokens: list) -> bytes:
+        return self.decode(tokens).encode()
+
+
+class ByteEncoder:
+    """An encoder with one token per UTF-8 byte, splitting multibyte characters."""
+
+    def encode(self, text: str) -> list:
+        return list(text.encode())
+
+    def decode(self, tokens: list) -> str:
+        return bytes(tokens).decode(errors="replace")
+
+    def decode_bytes(self, tokens: list) -> bytes:
+        return bytes(tokens)
+
+
+def use_encoder(monkeypatch, encoder):
+    monkeypatch.setattr(chatgpt, "get_encoder", lambda *args, **kwargs: encoder)
+
+
+def test_chunk_text_fits_the_budget_once_encoded(monkeypatch):
+    encoder = PrefixEncoder()
+    use_encoder(monkeypatch, encoder)
+    text = "Abc de. Fgh ij. Klm no.\n\nPqr st. Uvw xy.\n\nZ."
+    chunks = list(chatgpt.chunk_text(text, token_budget=12))
+    assert "".join(chunk for chunk, _ in chunks) == text
+    for chunk, num_tokens in chunks:
+        assert num_tokens == len(encoder.encode(chunk)) <= 12
+
+
+def test_chunk_text_repeats_the_last_sentences(monkeypatch):
+    use_encoder(monkeypatch, ByteEncoder())
+    chunks = [
+        chunk
+        for chunk, _ in chatgpt.chunk_text(
+            "One. Two. Three. Four. Five.", token_budget=12, overlap=5
+        )
+    ]
+    assert chunks == ["One. Two. ", "Two. Three. ", "Four. Five."]
+
+
+def test_chunk_tokens_keeps_multibyte_characters_whole(monkeypatch):
+    use_encoder(monkeypatch, ByteEncoder())
+    text = "é" * 7 + "a" + "€" * 3
+    parts = [
+        ByteEncoder().decode(part)
+        for part in chatgpt.chunk_tokens(list(text.encode()), token_budget=5)
+    ]
+    assert "".join(parts) == text
+    assert all(len(part.encode()) <= 5 for part in parts)
+
+
+def test_pack_paragraphs_rejects_empty_budget():
+    with pytest.raises(ValueError):
+        list(chatgpt.pack_paragraphs([], token_budget=0))
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from data_sources.news import crypto_news
+from utils import httpx_utils
+
+NEWEST = datetime(2023, 7, 10, 12)
+ITEMS = 2
+TOTAL_PAGES = 5
+
+
+def handle(request: httpx.Request) -> httpx.Response:
+    page = int(request.url.params["page"])
+    dates = [
+        NEWEST - timedelta(hours=(page - 1) * ITEMS + index) for index in range(ITEMS)
+    ]
+    return httpx.Response(
+        200,
+        json={
+            "total_pages": TOTAL_PAGES,
+            "data": [
+                {"date": dt.strftime("%a, %d %b %Y %H:%M:%S -0400"), "page": page}
+                for dt in dates
+            ],
+        },
+    )
+
+
+@pytest.fixture
+def client(monkeypatch, override_settings):
+    override_settings(HTTP_CACHE_ENABLED=False, CRYPTO_NEWS_MAX_CONCURRENCY=2)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    monkeypatch.setattr(httpx_utils, "get_async_client", lambda: client)
+    return client
+
+
+def fetch_pages(**kwargs) -> list:
+    async def run():
+        news = await crypto_news.get_crypto_news_async(
+            ["BTC"], datetime(2023, 7, 1), items=ITEMS, **kwargs
+        )
+        return sorted({item["page"] for item in news})
+
+    return asyncio.run(run())
+
+
+def test_limit_defaults_to_the_current_setting(client, override_settings):
+    override_settings(CRYPTO_NEW_LIMIT_FOR_DEMO=3)
+    assert fetch_pages() == [1, 2]
+    override_settings(CRYPTO_NEW_LIMIT_FOR_DEMO=5)
+    assert fetch_pages() == [1, 2, 3]
+
+
+def test_no_limit_paginates_to_the_last_page(client, override_settings):
+    override_settings(CRYPTO_NEW_LIMIT_FOR_DEMO=3)
+    assert fetch_pages(limit=0) == list(range(1, TOTAL_PAGES + 1))
+
+
+def test_shared_client_is_left_open(client):
+    fetch_pages(limit=0)
+    assert not client.is_closed
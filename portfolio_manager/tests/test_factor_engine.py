@@ -0,0 +1,13 @@
+import numpy as np
+import pandas as pd
+
+from models.factor_engine import cross_sectional_scaling
+
+
+def test_cross_sectional_scaling_keeps_missing_values():
+    timestamps = pd.Series([0, 0, 0, 1, 1, 2])
+    values = np.array([1.0, 1.0, np.nan, 2.0, 4.0, np.nan])
+    np.testing.assert_array_equal(
+        cross_sectional_scaling(values, timestamps),
+        [0.5, 0.5, np.nan, 0.0, 1.0, np.nan],
+    )
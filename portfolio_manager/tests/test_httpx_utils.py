@@ -0,0 +1,53 @@
+import asyncio
+import math
+
+import httpx
+
+from utils import httpx_utils
+from utils.async_utils import TokenBucket
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(capacity=100, period=1.0)
+        self.num_acquired = 0
+
+    async def acquire(self, cost: float = 1.0):
+        self.num_acquired += 1
+        await super().acquire(cost)
+
+
+def test_immutable_responses_are_fetched_once(tmp_path, override_settings, monkeypatch):
+    # A zero budget evicts every response which can expire.
+    override_settings(
+        HTTP_CACHE_ENABLED=True, HTTP_CACHE_DIR=str(tmp_path), HTTP_CACHE_MAX_MB=0
+    )
+    requested = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.params["date"])
+        return httpx.Response(200, json={"date": request.url.params["date"]})
+
+    async def run():
+        monkeypatch.setattr(
+            httpx_utils,
+            "get_async_client",
+            lambda: httpx.AsyncClient(transport=httpx.MockTransport(handle)),
+        )
+        bucket = CountingBucket()
+        for _ in range(2):
+            for date, cache_ttl in [("01-07-2023", math.inf), ("02-07-2023", 60)]:
+                body = await httpx_utils.request_async(
+                    "GET",
+                    "https://api.test/history",
+                    params={"date": date},
+                    cache_ttl=cache_ttl,
+                    bucket=bucket,
+                )
+                assert body == {"date": date}
+        return bucket
+
+    bucket = asyncio.run(run())
+    assert requested == ["01-07-2023", "02-07-2023", "02-07-2023"]
+    assert bucket.num_acquired == len(requested)
+    assert len(list((tmp_path / httpx_utils.IMMUTABLE_CACHE_DIR).glob("*.json"))) == 1
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from data_sources.exchange_data import kline_store
+
+
+@pytest.fixture
+def store_dir(tmp_path, override_settings):
+    override_settings(KLINE_STORE_DIR=str(tmp_path))
+    return tmp_path
+
+
+def write_bars(last_open: datetime):
+    data = pd.DataFrame(
+        {"Timestamp": pd.date_range(end=last_open, periods=3, freq="1h"), "close": 1.0}
+    )
+    kline_store.write_klines(data, "BTCUSDT", "1h", synced_from=data["Timestamp"][0])
+
+
+def test_stored_range_records_when_the_last_bar_was_written(store_dir):
+    last_open = datetime(2023, 7, 10, 12)
+    write_bars(last_open)
+    synced_from, stored_last_open, last_synced_at = kline_store.get_stored_range(
+        "BTCUSDT", "1h"
+    )
+    assert synced_from == last_open - timedelta(hours=2)
+    assert stored_last_open == last_open
+    assert last_synced_at > last_open + timedelta(hours=1)
+
+
+def test_missing_ranges_refresh_an_incomplete_last_bar(store_dir):
+    pytest.importorskip("ccxt")
+    from data_sources.exchange_data import binance
+
+    last_open = datetime(2023, 7, 10, 12)
+    last_close = last_open + timedelta(hours=1)
+    write_bars(last_open)
+    assert binance.get_missing_ranges("BTCUSDT", last_open, last_close, "1h") == []
+
+    # The last bar was written while it was still open.
+    meta = kline_store.read_meta("BTCUSDT", "1h")
+    meta["last_synced_at"] = (last_open + timedelta(minutes=30)).isoformat()
+    kline_store.write_meta("BTCUSDT", "1h", meta)
+    assert binance.get_missing_ranges("BTCUSDT", last_open, last_close, "1h") == [
+        (last_open, last_close)
+    ]
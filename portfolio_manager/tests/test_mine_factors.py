@@ -0,0 +1,128 @@
+import asyncio
+import re
+import time
+from pathlib import Path
+
+import openai
+import pytest
+from aiohttp import web
+
+from data_sources import mine_factors
+from utils import chatgpt
+from utils.async_utils import TokenBucket
+from utils.chatgpt import ChatRateLimiter
+
+
+class FakeEncoder:
+    """An encoder with one token per word, as the tiktoken encodings are downloaded."""
+
+    def encode(self, text: str) -> list:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def decode(self, tokens: list) -> str:
+        return "".join(tokens)
+
+    def decode_bytes(self, tokens: list) -> bytes:
+        return self.decode(tokens).encode()
+
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(chatgpt, "get_encoder", lambda *args, **kwargs: FakeEncoder())
+
+
+class ChatCompletionStub:
+    """
+    A local stub of the chat completion API.
+
+    The first request is rate limited, the extraction requests are answered slowly and the
+    reformatting requests with the JSON of one factor per paper.
+    """
+
+    def __init__(self):
+        self.num_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.num_requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.num_requests == 1:
+                return web.json_response(
+                    {"error": {"message": "Rate limit reached.", "type": "requests"}},
+                    status=429,
+                )
+            messages = (await request.json())["messages"]
+            await asyncio.sleep(0.05)
+            if "ONLY JSON" in messages[0]["content"]:
+                paper = messages[1]["content"].split("paper ")[1].split()[0]
+                content = (
+                    f'{{"factor_{paper}": "def signal(df, window, factor_name): ..."}}'
+                )
+            else:
+                paper = messages[1]["content"].split("```\n")[1].split()[1]
+                content = f"The factor of paper {paper} is the momentum."
+            return web.json_response(
+                {"choices": [{"message": {"role": "assistant", "content": content}}]}
+            )
+        finally:
+            self.in_flight -= 1
+
+
+async def serve(stub: ChatCompletionStub) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", stub.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def test_mine_factors_async_against_stub(override_settings, fake_encoder, monkeypatch):
+    override_settings(
+        CHATGPT_CACHE_ENABLED=False,
+        CHATGPT_MAX_CONCURRENCY=3,
+        MINING_FACTOR_LIMIT_FOR_DEMO=None,
+    )
+    num_acquired = 0
+    acquire = ChatRateLimiter.acquire
+
+    async def counting_acquire(self, *args, **kwargs):
+        nonlocal num_acquired
+        num_acquired += 1
+        await acquire(self, *args, **kwargs)
+
+    monkeypatch.setattr(ChatRateLimiter, "acquire", counting_acquire)
+    papers = [(Path(f"paper_{i}.pdf"), f"Paper {i} on momentum.") for i in range(6)]
+
+    async def run():
+        stub = ChatCompletionStub()
+        runner = await serve(stub)
+        host, port = runner.addresses[0][:2]
+        monkeypatch.setattr(openai, "api_base", f"http://{host}:{port}/v1")
+        try:
+            return stub, await mine_factors.mine_factors_async(iter(papers))
+        finally:
+            await runner.cleanup()
+
+    stub, factors = asyncio.run(run())
+    assert sorted(factors) == [f"factor_{i}" for i in range(6)]
+    # Two stages per paper, and the retry of the rate limited request.
+    assert stub.num_requests == 2 * len(papers) + 1
+    assert num_acquired == stub.num_requests
+    assert 1 < stub.max_in_flight <= 3
+
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(capacity=2, period=0.2)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # The first two requests use the full bucket, the next four wait for 0.1s each.
+    elapsed = asyncio.run(run())
+    assert 0.35 < elapsed < 0.6
@@ -0,0 +1,132 @@
+import json
+from contextlib import nullcontext
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import FIXTURES_DIR
+
+pytest.importorskip("praw")
+
+from data_sources.social_media import reddit  # noqa: E402
+
+
+class FakeSubreddit:
+    def __init__(self, posts):
+        self.posts = posts
+
+    def new(self, limit):
+        return iter(self.posts[:limit])
+
+    def hot(self, limit):
+        return iter(self.posts[:limit])
+
+
+class FakeReddit:
+    """A Reddit client replaying recorded listings of subreddits."""
+
+    def __init__(self, listings: dict):
+        self.listings = listings
+
+    def subreddit(self, name: str) -> FakeSubreddit:
+        if name not in self.listings:
+            raise LookupError(f"r/{name} is not recorded.")
+        return FakeSubreddit([SimpleNamespace(**post) for post in self.listings[name]])
+
+
+@pytest.fixture
+def listings():
+    return json.loads((FIXTURES_DIR / "reddit_new.json").read_text())
+
+
+def created_at(post: dict) -> datetime:
+    return datetime.utcfromtimestamp(post["created_utc"])
+
+
+def test_fetch_new_posts_stops_at_cursor(listings, override_settings):
+    override_settings(REDDIT_REVISIT_SECONDS=0)
+    posts = reddit.fetch_new_posts(
+        ["bitcoin", "ethereum"],
+        {"bitcoin": created_at(listings["bitcoin"][2])},
+        reddit=FakeReddit(listings),
+    )
+    assert [post["id"] for post in posts["bitcoin"]] == ["14w2k9a", "14w1x3c"]
+    assert [post["id"] for post in posts["ethereum"]] == ["14w2m1f", "14w1a2g"]
+
+
+def test_fetch_new_posts_revisits_before_cursor(listings, override_settings):
+    override_settings(REDDIT_REVISIT_SECONDS=3600)
+    posts = reddit.fetch_new_posts(
+        ["bitcoin"],
+        {"bitcoin": created_at(listings["bitcoin"][1])},
+        reddit=FakeReddit(listings),
+    )
+    assert [post["id"] for post in posts["bitcoin"]] == ["14w2k9a", "14w1x3c"]
+
+
+def test_fetch_new_posts_leaves_out_failed_subreddits(listings):
+    posts = reddit.fetch_new_posts(
+        ["bitcoin", "unknown"], {}, reddit=FakeReddit(listings)
+    )
+    assert list(posts) == ["bitcoin"]
+    assert len(posts["bitcoin"]) == 4
+
+
+def test_fetch_posts_reads_attributes(listings, override_settings):
+    override_settings(REDDIT_SUBREDDITS=["ethereum"])
+    posts = reddit.fetch_posts(reddit=FakeReddit(listings))
+    assert posts["ethereum"][0] == {
+        "score": 88,
+        "ups": 88,
+        "title": "Shanghai withdrawals recap",
+        "selftext": "A summary of the withdrawals so far.",
+    }
+
+
+def test_fetch_reddit_returns_new_or_changed_posts(
+    listings, override_settings, monkeypatch
+):
+    pytest.importorskip("ccxt")
+    from data_sources import sync_data
+
+    stored = {}
+    monkeypatch.setattr(sync_data, "pooled_connection", nullcontext)
+    monkeypatch.setattr(sync_data, "get_latest_values_by_key", lambda *args: {})
+    monkeypatch.setattr(
+        sync_data,
+        "get_stored_data",
+        lambda connection, table, column, source, values: {
+            value: stored[value] for value in values if value in stored
+        },
+    )
+    monkeypatch.setattr(
+        sync_data,
+        "fetch_new_posts",
+        lambda names, cursors, limit: reddit.fetch_new_posts(
+            names, cursors, limit=limit, reddit=FakeReddit(listings)
+        ),
+    )
+    override_settings(
+        REDDIT_SUBREDDITS=["bitcoin", "ethereum"], REDDIT_REVISIT_SECONDS=0
+    )
+    watermark = datetime(2023, 7, 10)
+
+    rows, new_watermark = sync_data.fetch_reddit(watermark)
+    assert len(rows) == 6
+    assert new_watermark == created_at(listings["bitcoin"][0])
+    # The data round-trips through JSONB, like the stored rows.
+    stored.update(
+        {
+            row["post_id"]: json.loads(json.dumps(row["data"], default=str))
+            for row in rows
+        }
+    )
+
+    rows, new_watermark = sync_data.fetch_reddit(watermark)
+    assert rows == []
+    assert new_watermark == watermark
+
+    listings["bitcoin"][0]["score"] += 10
+    rows, _ = sync_data.fetch_reddit(watermark)
+    assert [row["post_id"] for row in rows] == ["14w2k9a"]
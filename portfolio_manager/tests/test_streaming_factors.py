@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.factor_engine import compute_factor
+from models.streaming_factors import STREAMING_FACTORS, StreamingFactorEngine
+
+WINDOW = 10
+
+
+@pytest.fixture
+def market_data_df():
+    rng = np.random.default_rng(0)
+    timestamps = pd.date_range("2023-07-01", periods=80, freq="1h")
+    frames = []
+    for symbol in ["BTCUSDT", "ETHUSDT", "SOLUSDT"]:
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(timestamps))))
+        spread = close * rng.uniform(0.001, 0.01, len(timestamps))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Timestamp": timestamps,
+                    "symbol": symbol,
+                    "open": close * (1 + rng.normal(0, 0.002, len(timestamps))),
+                    "high": close + spread,
+                    "low": close - spread,
+                    "close": close,
+                    "volume": rng.uniform(10, 1000, len(timestamps)),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.mark.parametrize("factor_name", sorted(STREAMING_FACTORS))
+@pytest.mark.parametrize("engine", ["wide", "groupby"])
+def test_streaming_factors_match_batch_factors(market_data_df, factor_name, engine):
+    streaming_engine = StreamingFactorEngine([factor_name], WINDOW)
+    columns = ["Timestamp", "open", "high", "low", "close", "volume"]
+    streamed = [
+        streaming_engine.update(symbol, bar)[factor_name]
+        for symbol, bar in zip(
+            market_data_df["symbol"], market_data_df[columns].to_dict("records")
+        )
+    ]
+    np.testing.assert_allclose(
+        streamed,
+        compute_factor(market_data_df, factor_name, WINDOW, engine=engine),
+        rtol=1e-9,
+        atol=1e-12,
+    )
+
+
+def test_streaming_factor_engine_rejects_unsupported_factors():
+    with pytest.raises(ValueError, match="the supported factors are") as error:
+        StreamingFactorEngine([*STREAMING_FACTORS, "unknown"], window=10)
+    assert str(sorted(STREAMING_FACTORS)) in str(error.value)
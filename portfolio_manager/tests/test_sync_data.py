@@ -0,0 +1,54 @@
+from contextlib import nullcontext
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("ccxt")
+
+from data_sources import sync_data  # noqa: E402
+
+
+def test_fetch_binance_fetches_every_symbol_from_its_cursor(monkeypatch):
+    now = datetime(2023, 7, 10, 12)
+    calls = []
+
+    def fetch_exchange_data_range(symbols, start_dt, end_dt):
+        calls.append((sorted(symbols), start_dt))
+        return {
+            symbol: pd.DataFrame({"Timestamp": pd.date_range(start_dt, now, freq="1h")})
+            for symbol in symbols
+        }
+
+    monkeypatch.setattr(sync_data, "pooled_connection", nullcontext)
+    monkeypatch.setattr(
+        sync_data,
+        "get_latest_values_by_column",
+        lambda *args: {
+            "BTCUSDT": datetime(2023, 7, 10, 10),
+            "ETHUSDT": datetime(2023, 7, 10, 10),
+            "LUNAUSDT": datetime(2023, 5, 1),
+        },
+    )
+    monkeypatch.setattr(
+        sync_data,
+        "get_symbol_metadata",
+        lambda: {"LUNAUSDT": {"status": "SETTLING"}, "BTCUSDT": {"status": "TRADING"}},
+    )
+    monkeypatch.setattr(
+        sync_data,
+        "get_configured_symbols",
+        lambda: ["BTCUSDT", "ETHUSDT", "LUNAUSDT", "SOLUSDT"],
+    )
+    monkeypatch.setattr(
+        sync_data, "fetch_exchange_data_range", fetch_exchange_data_range
+    )
+
+    watermark = datetime(2023, 7, 9)
+    data, new_watermark = sync_data.fetch_binance(watermark)
+    assert sorted(calls) == [
+        (["BTCUSDT", "ETHUSDT"], datetime(2023, 7, 10, 10)),
+        (["SOLUSDT"], watermark),
+    ]
+    assert sorted(data) == ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+    assert new_watermark == now
@@ -0,0 +1,93 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket for client-side rate limiting.
+
+    The bucket holds up to `capacity` tokens and refills continuously at `capacity / period`
+    tokens per second. Each request acquires a number of tokens equal to its cost, e.g. the
+    request weight of a Binance endpoint.
+
+    Attributes:
+        capacity (float): The maximum number of tokens in the bucket.
+        period (float): The number of seconds needed to refill an empty bucket.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.period = period
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    async def acquire(self, cost: float = 1.0):
+        """
+        Wait until `cost` tokens are available and consume them.
+
+        Args:
+            cost (float, optional): The number of tokens to consume. Defaults to 1.0.
+
+        Raises:
+            ValueError: If the cost exceeds the capacity of the bucket.
+        """
+        if cost > self.capacity:
+            raise ValueError(
+                f"Cost {cost} exceeds the capacity {self.capacity} of the bucket."
+            )
+        async with self._lock:
+            self._refill()
+            while self._tokens < cost:
+                await asyncio.sleep((cost - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= cost
+
+
+async def retry_async(
+    func: Callable[[], Awaitable[T]],
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+) -> T:
+    """
+    Await a coroutine function, retrying with exponential backoff and jitter on failure.
+
+    Args:
+        func (Callable[[], Awaitable[T]]): A function returning a new awaitable for every attempt.
+        retries (int, optional): The maximum number of retries. Defaults to 5.
+        base_delay (float, optional): The delay in seconds before the first retry. Defaults to 1.0.
+        max_delay (float, optional): The upper bound of the delay in seconds. Defaults to 60.0.
+        exceptions (Tuple[Type[BaseException], ...], optional): The exceptions to retry on.
+
+    Returns:
+        T: The result of the first successful attempt.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await func()
+        except exceptions as e:
+            if attempt >= retries:
+                raise
+            delay = min(max_delay, base_delay * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+            print(f"Attempt {attempt + 1} failed with {e!r}, retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
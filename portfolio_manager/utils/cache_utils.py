@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+_memory_cache = {}
+_memory_cache_lock = threading.Lock()
+
+
+def file_md5(file_path: Path) -> str:
+    """
+    Compute the MD5 hex digest of a file's content.
+
+    Args:
+        file_path (Path): The path of the file.
+
+    Returns:
+        str: The MD5 hex digest.
+    """
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def atomic_write_bytes(file_path: Path, data: bytes):
+    """
+    Write bytes to a file so that concurrent readers never see a partial file.
+
+    Args:
+        file_path (Path): The path of the file.
+        data (bytes): The content to write.
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, file_path)
+
+
+def touch(file_path: Path):
+    """
+    Mark a cache entry as recently used.
+
+    Args:
+        file_path (Path): The path of the cache entry.
+    """
+    try:
+        os.utime(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def enforce_disk_budget(directory: Path, max_bytes: int, pattern: str = "*"):
+    """
+    Evict the least recently used cache entries until a directory fits its disk budget.
+
+    Entries are ordered by modification time, which `touch` updates on every cache hit.
+
+    Args:
+        directory (Path): The cache directory.
+        max_bytes (int): The disk budget in bytes.
+        pattern (str, optional): The glob pattern of the cache entries. Defaults to "*".
+    """
+    entries = []
+    for path in directory.glob(pattern):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.is_file():
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total_bytes <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total_bytes -= size
+
+
+def get_cached_json(
+    cache_path: Path, ttl: float, loader: Callable[[], Any], force_refresh: bool = False
+) -> Any:
+    """
+    Get a JSON value from the memory or disk cache, loading it again once it expires.
+
+    The value is kept in memory for the lifetime of the process and on disk across processes,
+    both stamped with the time it was loaded. If loading fails, an expired value is returned
+    instead of raising, as long as one is cached.
+
+    Args:
+        cache_path (Path): The cache file of the value.
+        ttl (float): The seconds a loaded value stays valid.
+        loader (Callable[[], Any]): The function loading the value, e.g. from an API.
+        force_refresh (bool, optional): Whether to load the value even if it is still valid.
+            Defaults to False.
+
+    Returns:
+        Any: The cached or freshly loaded value.
+    """
+    key = str(cache_path)
+    with _memory_cache_lock:
+        entry = _memory_cache.get(key)
+    if entry is None:
+        try:
+            entry = json.loads(cache_path.read_bytes())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Failed reading cache entry {cache_path}: {e}")
+
+    if (
+        entry is not None
+        and not force_refresh
+        and time.time() - entry["stored_at"] < ttl
+    ):
+        with _memory_cache_lock:
+            _memory_cache[key] = entry
+        return entry["value"]
+
+    try:
+        entry = {"stored_at": time.time(), "value": loader()}
+    except Exception as e:
+        if entry is None:
+            raise
+        print(f"Failed refreshing {cache_path}, using the expired entry: {e}")
+        return entry["value"]
+
+    atomic_write_bytes(cache_path, json.dumps(entry).encode())
+    with _memory_cache_lock:
+        _memory_cache[key] = entry
+    return entry["value"]
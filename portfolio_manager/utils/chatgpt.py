@@ -1,16 +1,50 @@
-import math
-from typing import List, Generator
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Iterable, List, Generator, Optional, Tuple
 
 import openai
 import tiktoken
 
+from .async_utils import TokenBucket, retry_async
 from .dynaconf_utils import settings
+from .llm_cache import get_cache_key, get_response_cache
 
 openai.api_key = settings.CHATGPT_API_KEY
+# Overridable to point the client at a compatible server, e.g. a local stub for testing.
+openai.api_base = settings.CHATGPT_API_BASE
+
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIError,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+)
+
+
+def read_cached_response(
+    prompt: List[dict], model: str, temperature: float, use_cache: bool
+) -> Optional[dict]:
+    cache = get_response_cache() if use_cache else None
+    if cache is None:
+        return None
+    return cache.get(get_cache_key(model, prompt, temperature))
+
+
+def write_cached_response(
+    prompt: List[dict], model: str, temperature: float, use_cache: bool, response: dict
+):
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        cache.set(get_cache_key(model, prompt, temperature), model, dict(response))
 
 
 def prompt_chatgpt_stream(
-    prompt: List[dict], model="gpt-3.5-turbo", temperature: float = 1.0
+    prompt: List[dict],
+    model="gpt-3.5-turbo",
+    temperature: float = 1.0,
+    use_cache: bool = True,
 ) -> dict:
     """
     Generates a chat-based response from the OpenAI GPT-3.5 Turbo model.
@@ -18,26 +52,37 @@ def prompt_chatgpt_stream(
     Args:
         prompt (List[dict]): A list of message dictionaries representing the conversation.
         model (str, optional): The model name to use. Defaults to "gpt-3.5-turbo".
+        use_cache (bool, optional): Whether to reuse and cache the response of the same
+            request. Defaults to True.
 
     Returns:
         dict: A dictionary containing the role and content of the generated response.
     """
+    cached = read_cached_response(prompt, model, temperature, use_cache)
+    if cached is not None:
+        return cached
+
     responses = list(
         openai.ChatCompletion.create(
             model=model, messages=prompt, stream=True, temperature=temperature
         )
     )
 
-    return {
+    result = {
         "role": responses[0]["choices"][0]["delta"].get("role", "assistant"),
         "content": "".join(
             chunk["choices"][0]["delta"].get("content", "") for chunk in responses
         ),
     }
+    write_cached_response(prompt, model, temperature, use_cache, result)
+    return result
 
 
 def prompt_chatgpt(
-    prompt: List[dict], model="gpt-3.5-turbo", temperature: float = 1.0
+    prompt: List[dict],
+    model="gpt-3.5-turbo",
+    temperature: float = 1.0,
+    use_cache: bool = True,
 ) -> dict:
     """
     Generates a chat-based response from the OpenAI GPT-3.5 Turbo model.
@@ -45,15 +90,98 @@ def prompt_chatgpt(
     Args:
         prompt (List[dict]): A list of message dictionaries representing the conversation.
         model (str, optional): The model name to use. Defaults to "gpt-3.5-turbo".
+        use_cache (bool, optional): Whether to reuse and cache the response of the same
+            request. Defaults to True.
 
     Returns:
         dict: A dictionary containing the role and content of the generated response.
     """
+    cached = read_cached_response(prompt, model, temperature, use_cache)
+    if cached is not None:
+        return cached
+
     response = openai.ChatCompletion.create(
         model=model, messages=prompt, temperature=temperature
     )
 
-    return response["choices"][0]["message"]
+    result = response["choices"][0]["message"]
+    write_cached_response(prompt, model, temperature, use_cache, result)
+    return result
+
+
+class ChatRateLimiter:
+    """
+    Client-side budgets of requests and tokens per minute for the chat completion API.
+
+    Each request consumes one request token and an estimate of its tokens, i.e. the tokens of
+    the prompt plus `settings.CHATGPT_COMPLETION_TOKENS_ESTIMATE` for the completion.
+
+    Attributes:
+        requests (TokenBucket): The bucket of requests per minute.
+        tokens (TokenBucket): The bucket of tokens per minute.
+    """
+
+    def __init__(self, requests_per_minute: int = None, tokens_per_minute: int = None):
+        self.requests = TokenBucket(
+            requests_per_minute or settings.CHATGPT_REQUESTS_PER_MINUTE, period=60.0
+        )
+        self.tokens = TokenBucket(
+            tokens_per_minute or settings.CHATGPT_TOKENS_PER_MINUTE, period=60.0
+        )
+
+    async def acquire(self, prompt: List[dict], num_tokens: int = None):
+        if num_tokens is None:
+            num_tokens = num_tokens_from_messages(prompt)
+        num_tokens += settings.CHATGPT_COMPLETION_TOKENS_ESTIMATE
+        await self.requests.acquire()
+        await self.tokens.acquire(min(num_tokens, self.tokens.capacity))
+
+
+async def prompt_chatgpt_async(
+    prompt: List[dict],
+    model="gpt-3.5-turbo",
+    temperature: float = 1.0,
+    rate_limiter: ChatRateLimiter = None,
+    use_cache: bool = True,
+    num_tokens: int = None,
+) -> dict:
+    """
+    Generates a chat-based response without blocking the event loop.
+
+    Rate limited and transient errors are retried with exponential backoff.
+
+    Args:
+        prompt (List[dict]): A list of message dictionaries representing the conversation.
+        model (str, optional): The model name to use. Defaults to "gpt-3.5-turbo".
+        temperature (float, optional): The sampling temperature. Defaults to 1.0.
+        rate_limiter (ChatRateLimiter, optional): The budgets shared by concurrent requests.
+        use_cache (bool, optional): Whether to reuse and cache the response of the same
+            request. Defaults to True.
+        num_tokens (int, optional): The tokens of the prompt if already counted, to avoid
+            encoding it again for the rate limiter.
+
+    Returns:
+        dict: A dictionary containing the role and content of the generated response.
+    """
+    cached = read_cached_response(prompt, model, temperature, use_cache)
+    if cached is not None:
+        return cached
+
+    async def create():
+        if rate_limiter is not None:
+            await rate_limiter.acquire(prompt, num_tokens)
+        return await openai.ChatCompletion.acreate(
+            model=model, messages=prompt, temperature=temperature
+        )
+
+    response = await retry_async(
+        create,
+        retries=settings.CHATGPT_MAX_RETRIES,
+        exceptions=RETRYABLE_ERRORS,
+    )
+    result = response["choices"][0]["message"]
+    write_cached_response(prompt, model, temperature, use_cache, result)
+    return result
 
 
 def num_tokens_from_messages(messages, encoder_model="gpt-3.5-turbo-0301") -> int:
@@ -89,6 +217,7 @@ def num_tokens_from_messages(messages, encoder_model="gpt-3.5-turbo-0301") -> in
         )
 
 
+@lru_cache(maxsize=None)
 def get_encoder(model: str):
     try:
         encoding = tiktoken.encoding_for_model(model)
@@ -97,41 +226,206 @@ def get_encoder(model: str):
     return encoding
 
 
+def tokenize(string: str, encoder_model="gpt-3.5-turbo-0301") -> List[int]:
+    return get_encoder(encoder_model).encode(string)
+
+
+def detokenize(tokens: List[int], encoder_model="gpt-3.5-turbo-0301") -> str:
+    return get_encoder(encoder_model).decode(tokens)
+
+
 def num_tokens_from_string(string: str, encoder_model="gpt-3.5-turbo-0301") -> int:
-    encoder = get_encoder(encoder_model)
-    return len(encoder.encode(string))
+    return len(tokenize(string, encoder_model))
 
 
-def chunk_string(string: str, n: int, encoder_model="gpt-3.5") -> str:
+def tokenize_paragraphs(
+    text: str, encoder_model="gpt-3.5-turbo-0301"
+) -> Generator[List[List[int]], None, None]:
     """
-    Chunk a string into n parts.
+    Encode a text paragraph by paragraph, in a single pass over the text.
+
+    Paragraphs are separated by blank lines and split into sentences, keeping all whitespace
+    so that decoding the tokens of all sentences restores the text.
 
     Args:
-        string (str): The string to be chunked.
-        n (int): The number of parts to divide the string into.
+        text (str): The text to encode.
+        encoder_model (str, optional): The model name. Defaults to "gpt-3.5-turbo-0301".
 
     Yields:
-        str: divided string
+        List[List[int]]: The tokens of every sentence of a paragraph.
+    """
+    encoder = get_encoder(encoder_model)
+    for paragraph in re.split(r"(?<=\n\n)", text):
+        if paragraph:
+            yield [
+                encoder.encode(sentence)
+                for sentence in re.split(r"(?<=[.!?]\s)", paragraph)
+                if sentence
+            ]
+
+
+def count_prompt_tokens(
+    prepare_messages: Callable[[str], List[dict]], encoder_model="gpt-3.5-turbo-0301"
+) -> int:
+    """
+    Count the tokens a prompt adds around its text.
+
+    Args:
+        prepare_messages (Callable[[str], List[dict]]): The function building the messages
+            of the prompt around a text.
+        encoder_model (str, optional): The model name. Defaults to "gpt-3.5-turbo-0301".
+
+    Returns:
+        int: The number of tokens of the messages built around an empty text.
+    """
+    return num_tokens_from_messages(prepare_messages(""), encoder_model)
+
+
+def chunk_tokens(
+    tokens: List[int], token_budget: int, encoder_model="gpt-3.5-turbo-0301"
+) -> Generator[List[int], None, None]:
     """
-    if n <= 0:
-        raise ValueError("Number of parts should be a positive integer.")
+    Slice tokens into parts of at most `token_budget` tokens, on character boundaries.
 
-    if len(string) < n:
-        raise ValueError("String length is less than the number of parts.")
+    A part ends early rather than splitting the bytes of a character between two parts, and
+    so that it still fits the budget once decoded and encoded again.
 
+    Args:
+        tokens (List[int]): The tokens to be sliced.
+        token_budget (int): The maximum number of tokens per part.
+        encoder_model (str, optional): The model name. Defaults to "gpt-3.5-turbo-0301".
+
+    Yields:
+        List[int]: The tokens of every part.
+    """
     encoder = get_encoder(encoder_model)
-    tokenized_strings = encoder.encode(string)
-    chunk_size = len(tokenized_strings) // n
-    remainder = len(tokenized_strings) % n
+
+    def fits(part: List[int]) -> bool:
+        try:
+            text = encoder.decode_bytes(part).decode("utf-8")
+        except UnicodeDecodeError:
+            return False
+        return len(encoder.encode(text)) <= token_budget
 
     start = 0
+    while start < len(tokens):
+        end = min(start + token_budget, len(tokens))
+        while end - start > 1 and not fits(tokens[start:end]):
+            end -= 1
+        yield tokens[start:end]
+        start = end
 
-    for i in range(n):
-        if i < remainder:
-            end = start + chunk_size + 1
-        else:
-            end = start + chunk_size
 
-        yield encoder.decode(tokenized_strings[start:end])
+def pack_paragraphs(
+    paragraphs: Iterable[List[List[int]]],
+    token_budget: int,
+    overlap: int = 0,
+    encoder_model="gpt-3.5-turbo-0301",
+) -> Generator[Tuple[str, int], None, None]:
+    """
+    Greedily pack tokenized paragraphs into chunks of at most `token_budget` tokens.
 
-        start = end
+    Paragraphs are kept whole unless a paragraph alone exceeds the budget, in which case it
+    is packed sentence by sentence, and sentences exceeding the budget are sliced with
+    `chunk_tokens`. Tokens may merge differently across sentences once a chunk is encoded
+    as a whole, so every chunk is encoded again and its last paragraphs or sentences are
+    deferred to the next chunk until it fits the budget.
+
+    Args:
+        paragraphs (Iterable[List[List[int]]]): The tokens of every sentence of every
+            paragraph, as yielded by `tokenize_paragraphs`.
+        token_budget (int): The maximum number of tokens per chunk.
+        overlap (int, optional): The maximum number of tokens repeated from the end of the
+            previous chunk, in whole paragraphs or sentences. Defaults to 0.
+        encoder_model (str, optional): The model name. Defaults to "gpt-3.5-turbo-0301".
+
+    Yields:
+        Tuple[str, int]: The text of every chunk and its number of tokens.
+    """
+    if token_budget <= 0:
+        raise ValueError("Token budget should be a positive integer.")
+    encoder = get_encoder(encoder_model)
+
+    def iter_segments() -> Generator[List[List[int]], None, None]:
+        # A segment is a whole paragraph, a sentence or a part of a sentence.
+        for paragraph in paragraphs:
+            if sum(len(sentence) for sentence in paragraph) <= token_budget:
+                yield paragraph
+                continue
+            for sentence in paragraph:
+                if len(sentence) <= token_budget:
+                    yield [sentence]
+                else:
+                    for part in chunk_tokens(sentence, token_budget, encoder_model):
+                        yield [part]
+
+    def size(kept: List[List[List[int]]]) -> int:
+        return sum(len(sentence) for segment in kept for sentence in segment)
+
+    def fits(kept: List[List[List[int]]], segment: Optional[List[List[int]]]) -> bool:
+        return segment is not None and size(kept) + size([segment]) <= token_budget
+
+    segments = iter_segments()
+    pending = deque()
+    chunk, num_overlapping = [], 0
+    while True:
+        segment = pending.popleft() if pending else next(segments, None)
+        if num_overlapping == len(chunk):
+            # The overlap gives way to the first new segment of the chunk.
+            while chunk and not fits(chunk, segment):
+                chunk.pop(0)
+            num_overlapping = len(chunk)
+        elif not fits(chunk, segment):
+            if segment is not None:
+                pending.appendleft(segment)
+            text = encoder.decode(
+                [token for kept in chunk for sentence in kept for token in sentence]
+            )
+            num_tokens = len(encoder.encode(text))
+            while num_tokens > token_budget and (len(chunk) > 1 or len(chunk[0]) > 1):
+                if num_overlapping:
+                    chunk.pop(0)
+                    num_overlapping -= 1
+                elif len(chunk) > 1:
+                    pending.appendleft(chunk.pop())
+                else:
+                    pending.extendleft([sentence] for sentence in chunk[0][:0:-1])
+                    chunk = [chunk[0][:1]]
+                text = encoder.decode(
+                    [token for kept in chunk for sentence in kept for token in sentence]
+                )
+                num_tokens = len(encoder.encode(text))
+            yield text, num_tokens
+
+            overlapping = []
+            for kept in reversed(chunk):
+                if size(overlapping) + size([kept]) > overlap:
+                    break
+                overlapping.insert(0, kept)
+            chunk, num_overlapping = overlapping, len(overlapping)
+            continue
+
+        if segment is None:
+            break
+        chunk.append(segment)
+
+
+def chunk_text(
+    text: str, token_budget: int, overlap: int = 0, encoder_model="gpt-3.5-turbo-0301"
+) -> Generator[Tuple[str, int], None, None]:
+    """
+    Chunk a text into whole paragraphs or sentences fitting a token budget.
+
+    Args:
+        text (str): The text to be chunked.
+        token_budget (int): The maximum number of tokens per chunk, as the chunk is encoded.
+        overlap (int, optional): The maximum number of tokens repeated from the end of the
+            previous chunk. Defaults to 0.
+        encoder_model (str, optional): The model name. Defaults to "gpt-3.5-turbo-0301".
+
+    Yields:
+        Tuple[str, int]: The text of every chunk and its number of tokens.
+    """
+    yield from pack_paragraphs(
+        tokenize_paragraphs(text, encoder_model), token_budget, overlap, encoder_model
+    )
@@ -1,5 +1,20 @@
-import psycopg2
+import io
+import json
+import threading
 from contextlib import contextmanager
+from datetime import datetime
+from typing import List
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from .dynaconf_utils import settings
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
 
 
 @contextmanager
@@ -20,3 +35,298 @@ def create_db_connection(host: str, port: int, database: str, user: str, passwor
         if connection:
             connection.close()
             print("PostgreSQL database connection closed")
+
+
+def get_connection_pool() -> ThreadedConnectionPool:
+    """
+    Get the process-wide pool of PostgreSQL connections, creating it on first use.
+
+    The connection parameters are read from the `POSTGRES_*` settings, which can be
+    overridden by environment variables of the same name.
+
+    Returns:
+        ThreadedConnectionPool: The connection pool.
+    """
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is None or _connection_pool.closed:
+            _connection_pool = ThreadedConnectionPool(
+                settings.POSTGRES_POOL_MIN_CONNECTIONS,
+                settings.POSTGRES_POOL_MAX_CONNECTIONS,
+                host=settings.POSTGRES_HOST,
+                port=settings.POSTGRES_PORT,
+                database=settings.POSTGRES_DB,
+                user=settings.get("POSTGRES_USER"),
+                password=settings.get("POSTGRES_PASSWORD"),
+            )
+    return _connection_pool
+
+
+def close_connection_pool():
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is not None and not _connection_pool.closed:
+            _connection_pool.closeall()
+        _connection_pool = None
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Context manager to borrow a connection from the pool.
+
+    The transaction is committed when the block exits normally and rolled back otherwise,
+    and the connection is returned to the pool either way.
+    """
+    pool = get_connection_pool()
+    connection = pool.getconn()
+    try:
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        pool.putconn(connection)
+
+
+def copy_upsert(
+    connection,
+    table: str,
+    df: pd.DataFrame,
+    conflict_columns: List[str],
+    batch_size: int = None,
+) -> int:
+    """
+    Upsert the rows of a DataFrame into a table with `COPY FROM STDIN`.
+
+    Every batch is streamed as CSV into a temporary staging table and merged into the target
+    table with a single `INSERT ... ON CONFLICT DO UPDATE`, then committed. Rows sharing the
+    same conflict key keep the last occurrence.
+
+    Args:
+        connection: The PostgreSQL connection.
+        table (str): The target table, whose columns are named like the DataFrame columns.
+        df (pd.DataFrame): The rows to upsert.
+        conflict_columns (List[str]): The columns of the unique constraint to upsert on.
+        batch_size (int, optional): The number of rows per batch. Defaults to
+            `settings.POSTGRES_COPY_BATCH_SIZE`.
+
+    Returns:
+        int: The number of rows upserted.
+    """
+    batch_size = batch_size or settings.POSTGRES_COPY_BATCH_SIZE
+    df = df.drop_duplicates(subset=conflict_columns, keep="last")
+    columns = list(df.columns)
+    update_columns = [column for column in columns if column not in conflict_columns]
+
+    staging = sql.Identifier(f"{table}_staging")
+    column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        staging, column_list
+    )
+    upsert_query = sql.SQL(
+        "INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+        "ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+    ).format(
+        table=sql.Identifier(table),
+        columns=column_list,
+        staging=staging,
+        conflict=sql.SQL(", ").join(map(sql.Identifier, conflict_columns)),
+        updates=sql.SQL(", ").join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+            for column in update_columns
+        ),
+    )
+
+    with connection.cursor() as cursor:
+        # The staging table lives as long as the pooled connection and is emptied on commit.
+        # It only has the copied columns and no defaults, so that the ids are assigned by the
+        # target table when rows are merged, without consuming its sequence on every copy.
+        cursor.execute(
+            sql.SQL(
+                "CREATE TEMP TABLE IF NOT EXISTS {} ON COMMIT DELETE ROWS AS "
+                "SELECT {} FROM {} WITH NO DATA"
+            ).format(staging, column_list, sql.Identifier(table))
+        )
+        for start in range(0, len(df), batch_size):
+            buffer = io.StringIO()
+            df.iloc[start : start + batch_size].to_csv(
+                buffer, index=False, header=False
+            )
+            buffer.seek(0)
+            cursor.copy_expert(copy_query.as_string(connection), buffer)
+            cursor.execute(upsert_query)
+            connection.commit()
+    return len(df)
+
+
+def get_latest_value(connection, table: str, column: str, source: str):
+    """
+    Get the maximum value of a column among the rows of a source.
+
+    Args:
+        connection: The PostgreSQL connection.
+        table (str): The table to query.
+        column (str): The column to aggregate, e.g. a timestamp.
+        source (str): The source of the rows.
+
+    Returns:
+        The maximum value, or None if the source has no rows.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.SQL("SELECT max({}) FROM {} WHERE source = %s").format(
+                sql.Identifier(column), sql.Identifier(table)
+            ),
+            (source,),
+        )
+        return cursor.fetchone()[0]
+
+
+def get_latest_values_by_key(
+    connection, table: str, column: str, source: str, key: str
+) -> dict:
+    """
+    Get the maximum value of a column among the rows of a source, per key of their data.
+
+    Args:
+        connection: The PostgreSQL connection.
+        table (str): The table to query.
+        column (str): The column to aggregate, e.g. a timestamp.
+        source (str): The source of the rows.
+        key (str): The key of the JSONB `data` column to group by, e.g. "subreddit".
+
+    Returns:
+        dict: The maximum value per value of the key.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.SQL(
+                "SELECT data->>%s, max({}) FROM {} WHERE source = %s GROUP BY 1"
+            ).format(sql.Identifier(column), sql.Identifier(table)),
+            (key, source),
+        )
+        return dict(cursor.fetchall())
+
+
+def get_latest_values_by_column(
+    connection, table: str, column: str, source: str, key_column: str
+) -> dict:
+    """
+    Get the maximum value of a column among the rows of a source, per value of a column.
+
+    Args:
+        connection: The PostgreSQL connection.
+        table (str): The table to query.
+        column (str): The column to aggregate, e.g. a timestamp.
+        source (str): The source of the rows.
+        key_column (str): The column to group by, e.g. "symbol".
+
+    Returns:
+        dict: The maximum value per value of the key column.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.SQL("SELECT {}, max({}) FROM {} WHERE source = %s GROUP BY 1").format(
+                sql.Identifier(key_column),
+                sql.Identifier(column),
+                sql.Identifier(table),
+            ),
+            (source,),
+        )
+        return dict(cursor.fetchall())
+
+
+def get_stored_data(
+    connection, table: str, column: str, source: str, values: List
+) -> dict:
+    """
+    Get the stored `data` of the rows of a source with the given values of a column.
+
+    Args:
+        connection: The PostgreSQL connection.
+        table (str): The table to query.
+        column (str): The column identifying the rows, e.g. a post ID.
+        source (str): The source of the rows.
+        values (List): The values to look up.
+
+    Returns:
+        dict: The stored data per value, for the values already stored.
+    """
+    if not values:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.SQL(
+                "SELECT {0}, data FROM {1} WHERE source = %s AND {0} = ANY(%s)"
+            ).format(sql.Identifier(column), sql.Identifier(table)),
+            (source, list(values)),
+        )
+        return dict(cursor.fetchall())
+
+
+def insert_raw_rows(
+    connection,
+    table: str,
+    rows: List[dict],
+    dedup_column: str = None,
+    update_on_conflict: bool = False,
+) -> int:
+    """
+    Insert rows into one of the `*_raw` tables with a single multi-row statement.
+
+    Args:
+        connection: The PostgreSQL connection.
+        table (str): The raw table.
+        rows (List[dict]): The rows with "title", "source", "published_at" and "data".
+        dedup_column (str, optional): A column identifying the rows of a source, backed by a
+            unique constraint on `(source, dedup_column)`. Rows whose value is already stored
+            are skipped. Defaults to None.
+        update_on_conflict (bool, optional): Whether to update the title and data of the
+            stored rows instead of skipping them, if their data changed. Defaults to False.
+
+    Returns:
+        int: The number of rows inserted or updated.
+    """
+    if not rows:
+        return 0
+    if dedup_column:
+        # A statement cannot upsert the same row twice, so keep the last occurrence.
+        rows = list({row[dedup_column]: row for row in rows}.values())
+    insert_dt = datetime.utcnow()
+    columns = ["title", "source", "published_at", "data", "insert_dt"]
+    if dedup_column:
+        columns.append(dedup_column)
+    query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    if dedup_column and update_on_conflict:
+        query += sql.SQL(
+            " ON CONFLICT (source, {column}) DO UPDATE SET title = EXCLUDED.title, "
+            "data = EXCLUDED.data, insert_dt = EXCLUDED.insert_dt "
+            "WHERE {table}.data IS DISTINCT FROM EXCLUDED.data RETURNING id"
+        ).format(column=sql.Identifier(dedup_column), table=sql.Identifier(table))
+    elif dedup_column:
+        query += sql.SQL(" ON CONFLICT (source, {}) DO NOTHING RETURNING id").format(
+            sql.Identifier(dedup_column)
+        )
+    with connection.cursor() as cursor:
+        inserted = execute_values(
+            cursor,
+            query.as_string(connection),
+            [
+                (
+                    row["title"],
+                    row["source"],
+                    row["published_at"],
+                    Json(row["data"], dumps=lambda obj: json.dumps(obj, default=str)),
+                    insert_dt,
+                )
+                + ((row[dedup_column],) if dedup_column else ())
+                for row in rows
+            ],
+            page_size=1000,
+            fetch=bool(dedup_column),
+        )
+    return len(inserted) if dedup_column else len(rows)
@@ -40,3 +40,18 @@ def datetime_range(start_dt: datetime, end_dt: datetime, delta: timedelta) -> da
     while current_dt <= end_dt:
         yield current_dt
         current_dt += delta
+
+
+def to_milliseconds(dt: datetime) -> int:
+    """
+    Convert a datetime to a UTC epoch timestamp in milliseconds.
+
+    Naive datetimes are interpreted as UTC, which is the time zone used by the exchanges.
+
+    Args:
+        dt (datetime): The datetime object to convert.
+
+    Returns:
+        int: The epoch timestamp in milliseconds.
+    """
+    return int(convert_to_utc("UTC", dt).timestamp() * 1000)
@@ -1,9 +1,257 @@
+import asyncio
+import atexit
+import hashlib
+import json
+import math
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Awaitable, Optional, TypeVar
+from urllib.parse import urlsplit
+
 import httpx
 
+from .async_utils import TokenBucket
+from .cache_utils import atomic_write_bytes, enforce_disk_budget, touch
+from .dynaconf_utils import settings
+
+T = TypeVar("T")
+
+RETRY_STATUS_CODES = {429, 503}
+# The subdirectory of the cache keeping immutable responses, which are never evicted.
+IMMUTABLE_CACHE_DIR = "immutable"
+
+_client = None
+_client_lock = threading.Lock()
+_host_semaphores = {}
+_async_clients = weakref.WeakKeyDictionary()
+_async_host_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_client_kwargs() -> dict:
+    return {
+        "http2": settings.HTTP_HTTP2,
+        "timeout": settings.HTTP_TIMEOUT,
+        "limits": httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    """
+    Get the process-wide HTTP client, which keeps connections alive across requests.
+
+    Returns:
+        httpx.Client: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**get_client_kwargs())
+    return _client
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+atexit.register(close_client)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the HTTP client shared by the coroutines of the running event loop.
 
-def request(method, url, params=None, data=None, json=None):
+    Returns:
+        httpx.AsyncClient: The shared client of the running event loop.
     """
-    Send an HTTP request.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**get_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_with_async_client(coroutine: Awaitable[T]) -> T:
+    """
+    Run a coroutine in a new event loop, closing the HTTP client of the loop afterwards.
+
+    Coroutines sharing a running loop never close its client themselves, as other
+    coroutines may still be using it.
+
+    Args:
+        coroutine (Awaitable[T]): The coroutine to run.
+
+    Returns:
+        T: The result of the coroutine.
+    """
+
+    async def run() -> T:
+        try:
+            return await coroutine
+        finally:
+            await close_async_client()
+
+    return asyncio.run(run())
+
+
+def get_host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    with _client_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(
+                settings.HTTP_MAX_CONCURRENCY_PER_HOST
+            )
+        return _host_semaphores[host]
+
+
+def get_async_host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    semaphores = _async_host_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if host not in semaphores:
+        semaphores[host] = asyncio.Semaphore(settings.HTTP_MAX_CONCURRENCY_PER_HOST)
+    return semaphores[host]
+
+
+def get_retry_delay(response: httpx.Response, attempt: int) -> float:
+    """
+    Get the delay before retrying a throttled request.
+
+    Args:
+        response (httpx.Response): The throttled response.
+        attempt (int): The number of the failed attempt, starting at 0.
+
+    Returns:
+        float: The delay in seconds from the `Retry-After` header, or an exponential backoff
+            if the header is missing.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (
+                    parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)
+                ).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), settings.HTTP_RETRY_MAX_DELAY)
+    return min(
+        settings.HTTP_RETRY_BASE_DELAY * 2**attempt, settings.HTTP_RETRY_MAX_DELAY
+    )
+
+
+def get_cache_dir() -> Path:
+    return Path(settings.ROOT_PATH_FOR_DYNACONF) / settings.HTTP_CACHE_DIR
+
+
+def get_cache_path(
+    method: str, url: str, params: Optional[dict], cache_ttl: float
+) -> Path:
+    key = json.dumps([method.upper(), url, sorted((params or {}).items())], default=str)
+    cache_dir = get_cache_dir()
+    if cache_ttl == math.inf:
+        cache_dir /= IMMUTABLE_CACHE_DIR
+    return cache_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+
+def read_cache_entry(cache_path: Path) -> Optional[dict]:
+    try:
+        return json.loads(cache_path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Failed reading cached response {cache_path}: {e}")
+        return None
+
+
+def write_cache_entry(cache_path: Path, entry: dict):
+    atomic_write_bytes(cache_path, json.dumps(entry).encode())
+    # Only the top-level entries are evicted, immutable responses are fetched once.
+    enforce_disk_budget(
+        get_cache_dir(), settings.HTTP_CACHE_MAX_MB * 1024 * 1024, "*.json"
+    )
+
+
+def is_fresh(entry: dict, cache_ttl: float) -> bool:
+    return time.time() - entry["stored_at"] < cache_ttl
+
+
+def get_validation_headers(entry: Optional[dict]) -> dict:
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def handle_response(
+    response: httpx.Response, cache_path: Optional[Path], entry: Optional[dict]
+):
+    """
+    Get the JSON body of a response, using and updating the cache entry if any.
+
+    Args:
+        response (httpx.Response): The final response of the request.
+        cache_path (Path, optional): The cache entry of the request, if caching is enabled.
+        entry (dict, optional): The stale cache entry that the request revalidated.
+
+    Returns:
+        The JSON body of the response.
+
+    Raises:
+        httpx.HTTPStatusError: If the response has an error status.
+    """
+    if response.status_code == 304 and entry is not None:
+        entry["stored_at"] = time.time()
+        write_cache_entry(cache_path, entry)
+        return entry["body"]
+
+    response.raise_for_status()
+    body = response.json()
+    if cache_path is not None:
+        write_cache_entry(
+            cache_path,
+            {
+                "url": str(response.url),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "stored_at": time.time(),
+                "body": body,
+            },
+        )
+    return body
+
+
+def request(method, url, params=None, data=None, json=None, cache_ttl=None):
+    """
+    Send an HTTP request over the shared client.
+
+    Throttled requests (429 and 503) are retried after the delay in their `Retry-After`
+    header. GET responses can be cached on disk: a cached response is returned as is within
+    its time to live, and revalidated with its ETag or Last-Modified header afterwards.
+    Responses cached without expiry are kept out of the disk budget of the cache, so they
+    are never fetched again.
 
     Args:
         method (str): The HTTP method (e.g., GET, POST, PUT, DELETE).
@@ -11,17 +259,95 @@ def request(method, url, params=None, data=None, json=None):
         params (dict, optional): The parameters to include in the request. Defaults to None.
         data (dict, optional): The data to include in the request body. Defaults to None.
         json (dict, optional): The JSON data to include in the request body. Defaults to None.
+        cache_ttl (float, optional): The seconds to cache a GET response for, `math.inf`
+            for immutable resources. Defaults to None, which disables the cache.
 
     Returns:
         dict: The JSON response from the request.
+
+    Raises:
+        httpx.HTTPError: If the request fails or still has an error status after retrying.
     """
-    with httpx.Client() as client:
-        try:
-            response = client.request(method, url, params=params, data=data, json=json)
-            response.raise_for_status()
-            return response.json()
-
-        except httpx.HTTPError as e:
-            print(f"HTTP error occurred: {e}")
-        except Exception as e:
-            print(f"An error occurred: {e}")
+    cache_path, entry, headers = None, None, {}
+    if cache_ttl is not None and settings.HTTP_CACHE_ENABLED and method == "GET":
+        cache_path = get_cache_path(method, url, params, cache_ttl)
+        entry = read_cache_entry(cache_path)
+        if entry is not None and is_fresh(entry, cache_ttl):
+            touch(cache_path)
+            return entry["body"]
+        headers = get_validation_headers(entry)
+
+    client = get_client()
+    with get_host_semaphore(url):
+        for attempt in range(settings.HTTP_MAX_RETRIES + 1):
+            response = client.request(
+                method, url, params=params, data=data, json=json, headers=headers
+            )
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == settings.HTTP_MAX_RETRIES
+            ):
+                break
+            delay = get_retry_delay(response, attempt)
+            print(f"Request to {url} throttled, retrying in {delay:.1f}s")
+            time.sleep(delay)
+    return handle_response(response, cache_path, entry)
+
+
+async def request_async(
+    method,
+    url,
+    params=None,
+    data=None,
+    json=None,
+    cache_ttl=None,
+    bucket: Optional[TokenBucket] = None,
+):
+    """
+    Send an HTTP request over the shared client of the running event loop.
+
+    See `request` for the retry and caching behavior.
+
+    Args:
+        method (str): The HTTP method (e.g., GET, POST, PUT, DELETE).
+        url (str): The URL to send the request to.
+        params (dict, optional): The parameters to include in the request. Defaults to None.
+        data (dict, optional): The data to include in the request body. Defaults to None.
+        json (dict, optional): The JSON data to include in the request body. Defaults to None.
+        cache_ttl (float, optional): The seconds to cache a GET response for, `math.inf`
+            for immutable resources. Defaults to None, which disables the cache.
+        bucket (TokenBucket, optional): The rate limit of the API, acquired before every
+            request sent, so that cached responses consume none of it. Defaults to None.
+
+    Returns:
+        dict: The JSON response from the request.
+
+    Raises:
+        httpx.HTTPError: If the request fails or still has an error status after retrying.
+    """
+    cache_path, entry, headers = None, None, {}
+    if cache_ttl is not None and settings.HTTP_CACHE_ENABLED and method == "GET":
+        cache_path = get_cache_path(method, url, params, cache_ttl)
+        entry = read_cache_entry(cache_path)
+        if entry is not None and is_fresh(entry, cache_ttl):
+            touch(cache_path)
+            return entry["body"]
+        headers = get_validation_headers(entry)
+
+    client = get_async_client()
+    async with get_async_host_semaphore(url):
+        for attempt in range(settings.HTTP_MAX_RETRIES + 1):
+            if bucket is not None:
+                await bucket.acquire()
+            response = await client.request(
+                method, url, params=params, data=data, json=json, headers=headers
+            )
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == settings.HTTP_MAX_RETRIES
+            ):
+                break
+            delay = get_retry_delay(response, attempt)
+            print(f"Request to {url} throttled, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    return handle_response(response, cache_path, entry)
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .dynaconf_utils import settings
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_cache_key(model: str, messages: List[dict], temperature: float) -> str:
+    """
+    Get the content address of a chat completion request.
+
+    Args:
+        model (str): The model name.
+        messages (List[dict]): The message dictionaries of the conversation.
+        temperature (float): The sampling temperature.
+
+    Returns:
+        str: The SHA-256 hex digest of the canonical JSON of the request.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    A SQLite cache of chat completion responses, keyed by the hash of their request.
+
+    The least recently used responses are evicted once the cached responses exceed the size
+    budget.
+
+    Attributes:
+        path (Path): The SQLite database file.
+        max_bytes (int): The size budget of the cached responses in bytes.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    last_used_at REAL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_last_used_at ON responses (last_used_at)"
+            )
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_used_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return json.loads(row[0])
+
+    def set(self, key: str, model: str, response: dict):
+        value = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, len(value.encode()), now, now),
+            )
+            self._connection.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (
+                            ORDER BY last_used_at DESC, key
+                        ) AS total_size
+                        FROM responses
+                    )
+                    WHERE total_size > ?
+                )
+                """,
+                (self.max_bytes,),
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache.
+
+    Returns:
+        Optional[ResponseCache]: The cache, or None if `settings.CHATGPT_CACHE_ENABLED` is off.
+    """
+    global _response_cache
+    if not settings.CHATGPT_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                Path(settings.ROOT_PATH_FOR_DYNACONF) / settings.CHATGPT_CACHE_PATH,
+                settings.CHATGPT_CACHE_MAX_MB * 1024 * 1024,
+            )
+    return _response_cache
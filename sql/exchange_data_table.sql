@@ -4,6 +4,8 @@ CREATE TABLE exchange_data_raw (
     source TEXT,
     published_at TIMESTAMP,
     data JSONB,
-    insert_dt TIMESTAMP,
-    INDEX idx_source_insert_dt (source, insert_dt)
+    insert_dt TIMESTAMP
 );
+
+CREATE INDEX idx_exchange_data_raw_source_insert_dt ON exchange_data_raw (source, insert_dt);
+CREATE INDEX idx_exchange_data_raw_source_published_at ON exchange_data_raw (source, published_at);
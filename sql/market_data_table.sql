@@ -4,25 +4,27 @@ CREATE TABLE market_data_raw (
     source TEXT,
     published_at TIMESTAMP,
     data JSONB,
-    insert_dt TIMESTAMP,
-    INDEX idx_source_insert_dt (source, insert_dt)
+    insert_dt TIMESTAMP
 );
 
+CREATE INDEX idx_market_data_raw_source_insert_dt ON market_data_raw (source, insert_dt);
+CREATE INDEX idx_market_data_raw_source_published_at ON market_data_raw (source, published_at);
+
 CREATE TABLE processed_market_data (
     id SERIAL PRIMARY KEY,
-    timestamp TIMESTAMP ,
-    open_price DECIMAL(14, 2) ,
-    high_price DECIMAL(14, 2) ,
-    low_price DECIMAL(14, 2) ,
-    close_price DECIMAL(14, 2) ,
-    volume DECIMAL(14, 2) ,
-    quote_volume DECIMAL(14, 2) ,
+    timestamp TIMESTAMP NOT NULL,
+    open_price DOUBLE PRECISION ,
+    high_price DOUBLE PRECISION ,
+    low_price DOUBLE PRECISION ,
+    close_price DOUBLE PRECISION ,
+    volume DOUBLE PRECISION ,
+    quote_volume DOUBLE PRECISION ,
     trade_num INTEGER ,
-    taker_buy_base_asset_volume DECIMAL(14, 2) ,
-    taker_buy_quote_asset_volume DECIMAL(14, 2) ,
+    taker_buy_base_asset_volume DOUBLE PRECISION ,
+    taker_buy_quote_asset_volume DOUBLE PRECISION ,
     funding_rate DECIMAL(10, 4) ,
-    symbol VARCHAR(10) ,
-    source TEXT,
+    symbol VARCHAR(32) NOT NULL,
+    source TEXT NOT NULL,
     insert_dt TIMESTAMP,
-    INDEX idx_source_symbol_timestamp (source, symbol, timestamp)
-)
\ No newline at end of file
+    CONSTRAINT uq_source_symbol_timestamp UNIQUE (source, symbol, timestamp)
+);
@@ -5,5 +5,9 @@ CREATE TABLE news_raw (
     published_at TIMESTAMP,
     data JSONB,
     insert_dt TIMESTAMP,
-    INDEX idx_source_insert_dt (source, insert_dt)
-);
\ No newline at end of file
+    url_hash CHAR(64),
+    CONSTRAINT uq_news_raw_source_url_hash UNIQUE (source, url_hash)
+);
+
+CREATE INDEX idx_news_raw_source_insert_dt ON news_raw (source, insert_dt);
+CREATE INDEX idx_news_raw_source_published_at ON news_raw (source, published_at);
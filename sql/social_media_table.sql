@@ -5,5 +5,10 @@ CREATE TABLE social_media_feeds_raw (
     published_at TIMESTAMP,
     data JSONB,
     insert_dt TIMESTAMP,
-    INDEX idx_source_insert_dt (source, insert_dt)
-);
\ No newline at end of file
+    post_id TEXT,
+    CONSTRAINT uq_social_media_feeds_raw_source_post_id UNIQUE (source, post_id)
+);
+
+CREATE INDEX idx_social_media_feeds_raw_source_insert_dt ON social_media_feeds_raw (source, insert_dt);
+CREATE INDEX idx_social_media_feeds_raw_source_published_at ON social_media_feeds_raw (source, published_at);
+CREATE INDEX idx_social_media_feeds_raw_source_subreddit_published_at ON social_media_feeds_raw (source, (data->>'subreddit'), published_at);